@@ -85,6 +85,12 @@ class AdminCommandsCog(commands.Cog):
             role_mapper=self.role_mapper
         )
 
+    async def cog_unload(self):
+        """Вызывается при выгрузке Cog"""
+        if self.sync_engine is not None:
+            await self.sync_engine.shutdown()
+        logger.info("AdminCommandsCog выгружен")
+
     @commands.hybrid_group(name="roleadmin", invoke_without_command=True, description="Команды администрирования ролей")
     @commands.has_permissions(administrator=True)
     async def role_admin(self, ctx: commands.Context):
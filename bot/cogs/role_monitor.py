@@ -61,6 +61,8 @@ class RoleMonitorCog(commands.Cog):
     async def cog_unload(self):
         """Вызывается при выгрузке Cog"""
         self.process_pending_syncs.cancel()
+        if self.sync_engine is not None:
+            await self.sync_engine.shutdown()
         logger.info("RoleMonitorCog выгружен")
 
     @commands.Cog.listener()
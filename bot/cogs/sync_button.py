@@ -57,6 +57,12 @@ class SyncButtonCog(commands.Cog):
         self.bot.add_view(view)
         logger.info("Persistent view для кнопки синхронизации зарегистрирован")
 
+    async def cog_unload(self):
+        """Вызывается при выгрузке Cog"""
+        if self.sync_engine is not None:
+            await self.sync_engine.shutdown()
+        logger.info("SyncButtonCog выгружен")
+
     @commands.Cog.listener()
     async def on_ready(self):
         """Вызывается когда бот полностью готов к работе"""
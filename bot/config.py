@@ -4,8 +4,14 @@
 
 import yaml
 import json
+
+# C-реализация загрузчика (libyaml) в 5-10 раз быстрее чистого Python
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 from bot.utils.logger import get_logger
 from bot.utils.errors import ConfigurationError
@@ -13,9 +19,9 @@ from bot.utils.errors import ConfigurationError
 logger = get_logger("config")
 
 
-@dataclass
+@dataclass(slots=True)
 class RoleMapping:
-    """Маппинг роли между серверами"""
+    """Маппинг роли между серверами (slots - меньше памяти, быстрее доступ к полям)"""
     id: str
     source_server_id: int
     source_role_id: int
@@ -26,25 +32,31 @@ class RoleMapping:
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'RoleMapping':
-        """Создать объект из словаря"""
+        """Создать объект из словаря (позиционная передача - дешевле kwargs)"""
         return cls(
-            id=data['id'],
-            source_server_id=int(data['source_server_id']),
-            source_role_id=int(data['source_role_id']),
-            target_server_id=int(data['target_server_id']),
-            target_role_id=int(data['target_role_id']),
-            description=data.get('description', ''),
-            enabled=data.get('enabled', True)
+            data['id'],
+            int(data['source_server_id']),
+            int(data['source_role_id']),
+            int(data['target_server_id']),
+            int(data['target_role_id']),
+            data.get('description', ''),
+            data.get('enabled', True)
         )
 
     def to_dict(self) -> Dict[str, Any]:
-        """Конвертировать в словарь"""
+        """
+        Конвертировать в словарь
+
+        ID пишутся как int (snowflake помещается в 63 бита, валидный JSON) -
+        без str() на сохранении и обратного int() на загрузке.
+        from_dict принимает оба варианта для совместимости со старыми файлами.
+        """
         return {
             'id': self.id,
-            'source_server_id': str(self.source_server_id),
-            'source_role_id': str(self.source_role_id),
-            'target_server_id': str(self.target_server_id),
-            'target_role_id': str(self.target_role_id),
+            'source_server_id': self.source_server_id,
+            'source_role_id': self.source_role_id,
+            'target_server_id': self.target_server_id,
+            'target_role_id': self.target_role_id,
             'description': self.description,
             'enabled': self.enabled
         }
@@ -65,6 +77,13 @@ class Config:
         self.mappings_path = Path(mappings_path)
         self._config: Dict[str, Any] = {}
         self._role_mappings: List[RoleMapping] = []
+        # Поддерживаемый срез активных маппингов - перестраивается только
+        # при загрузке/изменении, чтобы не аллоцировать список на каждый вызов
+        self._enabled_mappings: Tuple[RoleMapping, ...] = ()
+        self._mappings_by_id: Dict[str, RoleMapping] = {}
+        # mtime файла маппингов на момент последней загрузки/сохранения -
+        # позволяет пропустить повторный парсинг если файл не менялся
+        self._mappings_mtime_ns: Optional[int] = None
 
         self._load_config()
         self._load_mappings()
@@ -77,7 +96,7 @@ class Config:
                 raise ConfigurationError(f"Файл конфигурации не найден: {self.config_path}")
 
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                self._config = yaml.safe_load(f)
+                self._config = yaml.load(f, Loader=_YamlLoader)
 
             logger.info(f"Конфигурация загружена из {self.config_path}")
 
@@ -102,6 +121,8 @@ class Config:
                 for mapping in data.get('mappings', [])
             ]
 
+            self._rebuild_indexes()
+            self._mappings_mtime_ns = self.mappings_path.stat().st_mtime_ns
             logger.info(f"Загружено {len(self._role_mappings)} маппингов ролей")
 
         except json.JSONDecodeError as e:
@@ -109,6 +130,11 @@ class Config:
         except Exception as e:
             raise ConfigurationError(f"Ошибка загрузки маппингов: {e}")
 
+    def _rebuild_indexes(self) -> None:
+        """Перестроить кортеж активных маппингов и индекс по ID"""
+        self._enabled_mappings = tuple(m for m in self._role_mappings if m.enabled)
+        self._mappings_by_id = {m.id: m for m in self._role_mappings}
+
     def _create_default_mappings_file(self) -> None:
         """Создать файл маппингов с примером"""
         default_data = {
@@ -146,7 +172,15 @@ class Config:
         logger.info("Конфигурация валидна")
 
     def reload_mappings(self) -> None:
-        """Перезагрузить маппинги ролей"""
+        """Перезагрузить маппинги ролей (пропускается если файл не менялся)"""
+        if self._mappings_mtime_ns is not None:
+            try:
+                if self.mappings_path.stat().st_mtime_ns == self._mappings_mtime_ns:
+                    logger.debug("Файл маппингов не изменился, перезагрузка пропущена")
+                    return
+            except OSError:
+                pass  # Файл недоступен - пусть _load_mappings разберется
+
         logger.info("Перезагрузка маппингов ролей...")
         self._load_mappings()
 
@@ -160,6 +194,9 @@ class Config:
             with open(self.mappings_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
 
+            # Память уже актуальна - фиксируем новый mtime чтобы
+            # последующий reload_mappings не перечитывал файл впустую
+            self._mappings_mtime_ns = self.mappings_path.stat().st_mtime_ns
             logger.info(f"Маппинги сохранены в {self.mappings_path}")
 
         except Exception as e:
@@ -225,20 +262,27 @@ class Config:
 
     # ============ Геттеры для маппингов ролей ============
 
-    def get_role_mappings(self) -> List[RoleMapping]:
-        """Получить все маппинги ролей"""
-        return [m for m in self._role_mappings if m.enabled]
+    def get_role_mappings(self) -> Tuple[RoleMapping, ...]:
+        """
+        Получить активные маппинги ролей
+
+        Returns:
+            Неизменяемый кортеж активных маппингов (при необходимости
+            мутации вызывающий код должен сделать копию)
+        """
+        return self._enabled_mappings
 
     def get_all_role_mappings(self) -> List[RoleMapping]:
         """Получить все маппинги ролей (включая отключенные)"""
         return self._role_mappings
 
+    def get_mapping_count(self) -> int:
+        """Получить общее количество маппингов (включая отключенные)"""
+        return len(self._role_mappings)
+
     def get_mapping_by_id(self, mapping_id: str) -> Optional[RoleMapping]:
-        """Получить маппинг по ID"""
-        for mapping in self._role_mappings:
-            if mapping.id == mapping_id:
-                return mapping
-        return None
+        """Получить маппинг по ID (O(1) через индекс)"""
+        return self._mappings_by_id.get(mapping_id)
 
     def add_role_mapping(self, mapping: RoleMapping) -> None:
         """
@@ -247,11 +291,12 @@ class Config:
         Args:
             mapping: Объект маппинга
         """
-        # Проверяем, не существует ли уже такой ID
-        if any(m.id == mapping.id for m in self._role_mappings):
+        # Проверяем, не существует ли уже такой ID (O(1) через индекс)
+        if mapping.id in self._mappings_by_id:
             raise ConfigurationError(f"Маппинг с ID {mapping.id} уже существует")
 
         self._role_mappings.append(mapping)
+        self._rebuild_indexes()
         self.save_mappings()
         logger.info(f"Добавлен новый маппинг: {mapping.id}")
 
@@ -269,6 +314,7 @@ class Config:
         self._role_mappings = [m for m in self._role_mappings if m.id != mapping_id]
 
         if len(self._role_mappings) < original_len:
+            self._rebuild_indexes()
             self.save_mappings()
             logger.info(f"Удален маппинг: {mapping_id}")
             return True
@@ -288,6 +334,7 @@ class Config:
         for i, m in enumerate(self._role_mappings):
             if m.id == mapping.id:
                 self._role_mappings[i] = mapping
+                self._rebuild_indexes()
                 self.save_mappings()
                 logger.info(f"Обновлен маппинг: {mapping.id}")
                 return True
@@ -2,16 +2,41 @@
 Утилиты для проверки прав бота на серверах
 """
 
-import discord
-from typing import List, Tuple, Dict, Optional
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import List, Sequence, Tuple, Dict, Optional, TYPE_CHECKING
 from bot.utils.logger import get_logger
 
+# discord нужен только для аннотаций типов - ленивый импорт ускоряет
+# холодный старт путей, которым Discord не требуется (валидация конфига и т.д.)
+if TYPE_CHECKING:
+    import discord
+
 logger = get_logger("core.permissions")
 
 
+# Фиксированные наборы прав для validate_server_permissions -
+# кортежи-константы, чтобы не пересобирать список на каждый вызов
+_BASE_REQUIRED_PERMS = (
+    'view_channel',      # Просмотр каналов
+    'send_messages',     # Отправка сообщений
+    'embed_links',       # Вставка ссылок
+    'read_message_history',  # Чтение истории сообщений
+)
+_BASE_REQUIRED_PERMS_WITH_MANAGE = _BASE_REQUIRED_PERMS + ('manage_roles',)
+
+
+@lru_cache(maxsize=None)
+def _permissions_mask(perm_names: Tuple[str, ...]) -> int:
+    """Собрать битовую маску прав по их названиям (кешируется)"""
+    import discord
+    return discord.Permissions(**{name: True for name in perm_names}).value
+
+
 async def check_bot_permissions(
     guild: discord.Guild,
-    required_permissions: List[str]
+    required_permissions: Sequence[str]
 ) -> Tuple[bool, List[str]]:
     """
     Проверить наличие необходимых прав у бота на сервере
@@ -30,9 +55,14 @@ async def check_bot_permissions(
             return False, required_permissions
 
         permissions = bot_member.guild_permissions
-        missing_permissions = []
 
-        # Проверяем каждое требуемое право
+        # Быстрый путь: одна проверка битовой маски вместо getattr по именам
+        mask = _permissions_mask(tuple(required_permissions))
+        if permissions.value & mask == mask:
+            return True, []
+
+        # Маска не сошлась - определяем какие именно права отсутствуют
+        missing_permissions = []
         for perm_name in required_permissions:
             if not getattr(permissions, perm_name, False):
                 missing_permissions.append(perm_name)
@@ -114,16 +144,11 @@ async def validate_server_permissions(
     """
     issues = []
 
-    # Список необходимых прав
-    required_perms = [
-        'view_channel',      # Просмотр каналов
-        'send_messages',     # Отправка сообщений
-        'embed_links',       # Вставка ссылок
-        'read_message_history',  # Чтение истории сообщений
-    ]
-
-    if check_manage_roles:
-        required_perms.append('manage_roles')
+    # Выбираем предсобранный набор прав
+    required_perms = (
+        _BASE_REQUIRED_PERMS_WITH_MANAGE if check_manage_roles
+        else _BASE_REQUIRED_PERMS
+    )
 
     # Проверяем права
     has_all, missing = await check_bot_permissions(guild, required_perms)
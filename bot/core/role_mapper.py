@@ -2,7 +2,9 @@
 Система маппинга ролей между серверами
 """
 
-from typing import List, Optional, Tuple, Dict
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
 from bot.config import Config, RoleMapping
 from bot.database.operations import DatabaseOperations
 from bot.utils.logger import get_logger
@@ -24,52 +26,104 @@ class RoleMapper:
         """
         self.config = config
         self.db = db
-        self._mapping_cache: Dict[Tuple[int, int], int] = {}
+        # Вложенный словарь server_id -> {role_id: target_role_id} -
+        # без создания/хеширования кортежа-ключа на каждый lookup
+        self._mapping_cache: Dict[int, Dict[int, int]] = {}
         # Обратный индекс: множество всех целевых ролей для быстрой проверки O(1)
         self._target_roles_set: set = set()
+        # Обратный индекс: целевая роль -> список пар (server_id, source_role_id)
+        self._reverse_cache: Dict[int, List[Tuple[int, int]]] = {}
+        # Инкрементальный счетчик активных маппингов - без скана кеша в get_stats
+        self._enabled_count = 0
         self._initialized = False
+        # Слияние конкурентных initialize(): первый вызов грузит кеш,
+        # остальные ждут события вместо повторной загрузки из БД
+        self._init_started = False
+        self._init_event: Optional[asyncio.Event] = None
+        # Сериализация писателей: читатели остаются без блокировок (RCU),
+        # но конкурентные мутации кеша/БД не должны перемешиваться
+        self._writer_lock = asyncio.Lock()
+        # Ленивый кеш представлений get_mappings_for_server -
+        # строится по запросу, сбрасывается писателями
+        self._per_server_view: Dict[int, List[Dict]] = {}
+        # Версия кеша: инкрементируется при каждой публикации изменений,
+        # внешние мемоизации используют ее для инвалидации
+        self._cache_version = 0
 
     async def initialize(self):
         """Инициализация - загрузка маппингов в кеш"""
         if self._initialized:
             return
 
-        logger.info("Инициализация RoleMapper...")
-        await self.load_mappings()
-        self._initialized = True
-        logger.info("RoleMapper инициализирован")
+        if self._init_started:
+            # Инициализация уже идет в другой задаче - просто дожидаемся
+            await self._init_event.wait()
+            return
+
+        self._init_started = True
+        self._init_event = asyncio.Event()
+        try:
+            logger.info("Инициализация RoleMapper...")
+            await self.load_mappings()
+            self._initialized = True
+            logger.info("RoleMapper инициализирован")
+        except Exception:
+            # Даем следующему вызову повторить попытку
+            self._init_started = False
+            raise
+        finally:
+            self._init_event.set()
 
     async def load_mappings(self):
         """Загрузить маппинги из базы данных в память"""
+        async with self._writer_lock:
+            await self._load_mappings_unlocked()
+
+    async def _load_mappings_unlocked(self):
+        """Тело загрузки маппингов; вызывается под _writer_lock"""
         try:
             # Получаем все маппинги из БД
             mappings = await self.db.get_all_mappings()
 
-            # Очищаем старые кеши
-            self._mapping_cache.clear()
-            self._target_roles_set.clear()
-
-            # Загружаем в кеш только активные маппинги
-            for mapping in mappings:
-                if mapping['enabled']:
-                    # Преобразуем ID в int для корректного сравнения
-                    source_server_id = int(mapping['source_server_id'])
-                    source_role_id = int(mapping['source_role_id'])
-                    target_role_id = int(mapping['target_role_id'])
-
-                    key = (source_server_id, source_role_id)
-                    self._mapping_cache[key] = target_role_id
-                    # Добавляем в обратный индекс
-                    self._target_roles_set.add(target_role_id)
-
-                    # Детальное логирование только в DEBUG режиме
-                    logger.debug(
-                        f"Маппинг загружен: сервер {source_server_id}, "
-                        f"роль {source_role_id} -> целевая роль {target_role_id}"
-                    )
+            # Строим новые кеши в стороне и публикуем одним присваиванием
+            # атрибута (RCU-паттерн): читатели, успевшие взять старую ссылку,
+            # дочитывают по ней - нет окна, где кеш очищен наполовину
+            new_cache: Dict[int, Dict[int, int]] = {}
+
+            # Фильтр + распаковка одним list-comprehension (ID приходят из БД
+            # уже как int: колонки INTEGER, SQLite приводит значения при вставке)
+            enabled_rows = [
+                (m['source_server_id'], m['source_role_id'], m['target_role_id'])
+                for m in mappings if m['enabled']
+            ]
+
+            for source_server_id, source_role_id, target_role_id in enabled_rows:
+                new_cache.setdefault(source_server_id, {})[source_role_id] = target_role_id
+
+            # Обратные индексы: множество целевых ролей и
+            # целевая роль -> исходные пары (server_id, source_role_id)
+            new_targets = {target for _, _, target in enabled_rows}
+            new_reverse: Dict[int, List[Tuple[int, int]]] = {}
+            for source_server_id, source_role_id, target_role_id in enabled_rows:
+                new_reverse.setdefault(target_role_id, []).append(
+                    (source_server_id, source_role_id)
+                )
+            enabled_count = sum(len(inner) for inner in new_cache.values())
+
+            # Одна отложенная DEBUG-запись вместо цикла по строкам:
+            # %r форматируется логгером только если уровень активен
+            logger.debug("Загруженные маппинги (сервер, роль, цель): %r", enabled_rows)
+
+            # Публикация: присваивание атрибута атомарно под GIL
+            self._mapping_cache = new_cache
+            self._target_roles_set = new_targets
+            self._reverse_cache = new_reverse
+            self._enabled_count = enabled_count
+            self._per_server_view = {}
+            self._cache_version += 1
 
             logger.info(
-                f"Загружено {len(self._mapping_cache)} активных маппингов в кеш, "
+                f"Загружено {self._cached_mapping_count()} активных маппингов в кеш, "
                 f"{len(self._target_roles_set)} уникальных целевых ролей"
             )
 
@@ -79,36 +133,141 @@ class RoleMapper:
 
     async def reload_mappings(self):
         """Перезагрузить маппинги из конфигурации и обновить БД"""
-        try:
-            logger.info("Перезагрузка маппингов из конфигурации...")
-
-            # Перезагружаем конфигурацию
-            self.config.reload_mappings()
-
-            # Очищаем кеш в БД
-            await self.db.clear_mapping_cache()
-
-            # Загружаем маппинги из конфига в БД
-            mappings = self.config.get_all_role_mappings()
-            for mapping in mappings:
-                await self.db.cache_role_mapping(
-                    mapping_id=mapping.id,
-                    source_server_id=mapping.source_server_id,
-                    source_role_id=mapping.source_role_id,
-                    target_server_id=mapping.target_server_id,
-                    target_role_id=mapping.target_role_id,
-                    enabled=mapping.enabled,
-                    description=mapping.description
-                )
+        async with self._writer_lock:
+            try:
+                logger.info("Перезагрузка маппингов из конфигурации...")
+
+                # Перезагружаем конфигурацию
+                self.config.reload_mappings()
+
+                # Диффим конфиг против текущего состояния БД и пишем только
+                # разницу - вместо полной очистки и перезаливки кеша
+                old_rows = {
+                    row['mapping_id']: row
+                    for row in await self.db.get_all_mappings()
+                }
+
+                mappings = self.config.get_all_role_mappings()
+                changed_rows = []
+                for mapping in mappings:
+                    old = old_rows.pop(mapping.id, None)
+                    if old is not None and (
+                        old['source_server_id'] == mapping.source_server_id
+                        and old['source_role_id'] == mapping.source_role_id
+                        and old['target_server_id'] == mapping.target_server_id
+                        and old['target_role_id'] == mapping.target_role_id
+                        and bool(old['enabled']) == mapping.enabled
+                        and old['description'] == mapping.description
+                    ):
+                        continue  # Строка не изменилась - не трогаем
+                    changed_rows.append((
+                        mapping.id,
+                        mapping.source_server_id,
+                        mapping.source_role_id,
+                        mapping.target_server_id,
+                        mapping.target_role_id,
+                        mapping.enabled,
+                        mapping.description
+                    ))
+
+                # Оставшиеся в old_rows записи исчезли из конфига - удаляем
+                await self.db.remove_mappings_bulk(list(old_rows))
+                await self.db.cache_role_mappings_bulk(changed_rows)
+
+                # Перезагружаем в память (блокировка уже взята)
+                await self._load_mappings_unlocked()
+
+                logger.info("Маппинги успешно перезагружены")
+
+            except Exception as e:
+                logger.error(f"Ошибка перезагрузки маппингов: {e}", exc_info=True)
+                raise RoleMappingError(f"Не удалось перезагрузить маппинги: {e}")
+
+    def _cached_mapping_count(self) -> int:
+        """Количество активных маппингов в кеше (O(1) через счетчик)"""
+        return self._enabled_count
+
+    def _insert_into_cache(self, source_server_id: int, source_role_id: int, target_role_id: int) -> None:
+        """
+        Добавить маппинг в кеш copy-on-write: мутируются только копии,
+        публикация - атомарным присваиванием (читатели без блокировок)
 
-            # Перезагружаем в память
-            await self.load_mappings()
+        Args:
+            source_server_id: ID исходного сервера
+            source_role_id: ID исходной роли
+            target_role_id: ID целевой роли
+        """
+        new_cache = dict(self._mapping_cache)
+        inner = dict(new_cache.get(source_server_id, ()))
+        prev_target = inner.get(source_role_id)
+        if prev_target is None:
+            self._enabled_count += 1
+        inner[source_role_id] = target_role_id
+        new_cache[source_server_id] = inner
+
+        new_targets = set(self._target_roles_set)
+        new_targets.add(target_role_id)
+
+        # Поддерживаем обратный индекс; если пара была привязана к другой
+        # целевой роли - убираем старую привязку
+        pair = (source_server_id, source_role_id)
+        new_reverse = dict(self._reverse_cache)
+        if prev_target is not None and prev_target != target_role_id:
+            remaining = [p for p in new_reverse.get(prev_target, ()) if p != pair]
+            if remaining:
+                new_reverse[prev_target] = remaining
+            else:
+                new_reverse.pop(prev_target, None)
+                new_targets.discard(prev_target)
+        pairs = list(new_reverse.get(target_role_id, ()))
+        if pair not in pairs:
+            pairs.append(pair)
+        new_reverse[target_role_id] = pairs
+
+        self._mapping_cache = new_cache
+        self._target_roles_set = new_targets
+        self._reverse_cache = new_reverse
+        self._per_server_view.pop(source_server_id, None)
+        self._cache_version += 1
+
+    def _remove_from_cache(self, source_server_id: int, source_role_id: int) -> None:
+        """
+        Удалить маппинг из кеша (copy-on-write) и почистить обратный индекс
 
-            logger.info("Маппинги успешно перезагружены")
+        Args:
+            source_server_id: ID исходного сервера
+            source_role_id: ID исходной роли
+        """
+        old_inner = self._mapping_cache.get(source_server_id)
+        if old_inner is None or source_role_id not in old_inner:
+            return
 
-        except Exception as e:
-            logger.error(f"Ошибка перезагрузки маппингов: {e}", exc_info=True)
-            raise RoleMappingError(f"Не удалось перезагрузить маппинги: {e}")
+        new_cache = dict(self._mapping_cache)
+        inner = dict(old_inner)
+        removed_target = inner.pop(source_role_id)
+        self._enabled_count -= 1
+        if inner:
+            new_cache[source_server_id] = inner
+        else:
+            del new_cache[source_server_id]
+
+        # Чистим обратные индексы: O(1) через _reverse_cache вместо скана кеша
+        pair = (source_server_id, source_role_id)
+        new_reverse = dict(self._reverse_cache)
+        remaining = [p for p in new_reverse.get(removed_target, ()) if p != pair]
+        new_targets = self._target_roles_set
+        if remaining:
+            new_reverse[removed_target] = remaining
+        else:
+            new_reverse.pop(removed_target, None)
+            new_targets = set(new_targets)
+            new_targets.discard(removed_target)
+
+        self._mapping_cache = new_cache
+        self._target_roles_set = new_targets
+        self._reverse_cache = new_reverse
+        self._per_server_view.pop(source_server_id, None)
+        self._cache_version += 1
 
     def get_target_role(self, source_server_id: int, source_role_id: int) -> Optional[int]:
         """
@@ -121,42 +280,43 @@ class RoleMapper:
         Returns:
             ID целевой роли или None если маппинг не найден
         """
-        key = (source_server_id, source_role_id)
-        target_role_id = self._mapping_cache.get(key)
+        inner = self._mapping_cache.get(source_server_id)
+        target_role_id = inner.get(source_role_id) if inner is not None else None
 
-        if target_role_id:
+        if target_role_id is not None and logger.isEnabledFor(logging.DEBUG):
             logger.debug(
-                f"Найден маппинг: сервер {source_server_id}, "
-                f"роль {source_role_id} -> {target_role_id}"
+                "Найден маппинг: сервер %d, роль %d -> %d",
+                source_server_id, source_role_id, target_role_id
             )
 
         return target_role_id
 
     def get_all_target_roles(
         self,
-        source_roles: List[Tuple[int, int]]
+        source_roles: Iterable[Tuple[int, int]]
     ) -> List[int]:
         """
-        Получить все целевые роли для списка исходных ролей
+        Получить все целевые роли для исходных ролей
 
         Args:
-            source_roles: Список кортежей (server_id, role_id)
+            source_roles: Итерируемое пар (server_id, role_id) -
+                список или генератор, потребляется за один проход
 
         Returns:
             Список ID целевых ролей (без дубликатов)
         """
-        target_roles = set()
-
-        for server_id, role_id in source_roles:
-            target_role = self.get_target_role(server_id, role_id)
-            if target_role:
-                target_roles.add(target_role)
-
-        result = list(target_roles)
-        logger.debug(
-            f"Из {len(source_roles)} исходных ролей найдено "
-            f"{len(result)} уникальных целевых ролей"
-        )
+        # Inline-lookup по локальной ссылке на кеш - без вызова
+        # get_target_role (и его debug-ветки) на каждую роль.
+        # dict.fromkeys дедуплицирует с сохранением порядка обхода -
+        # результат детерминирован от вызова к вызову
+        cache = self._mapping_cache
+        result = list(dict.fromkeys(
+            inner[role_id]
+            for server_id, role_id in source_roles
+            if (inner := cache.get(server_id)) is not None and role_id in inner
+        ))
+
+        logger.debug("Найдено %d уникальных целевых ролей", len(result))
 
         return result
 
@@ -171,8 +331,48 @@ class RoleMapper:
         Returns:
             True если маппинг существует
         """
-        key = (source_server_id, source_role_id)
-        return key in self._mapping_cache
+        inner = self._mapping_cache.get(source_server_id)
+        return inner is not None and source_role_id in inner
+
+    def get_sources_for_target(self, target_role_id: int) -> List[Tuple[int, int]]:
+        """
+        Получить исходные роли, которые ведут к данной целевой роли (O(1))
+
+        Args:
+            target_role_id: ID целевой роли
+
+        Returns:
+            Список пар (source_server_id, source_role_id)
+        """
+        return self._reverse_cache.get(target_role_id, [])
+
+    @property
+    def cache_version(self) -> int:
+        """Текущая версия кеша маппингов (растет при каждом изменении)"""
+        return self._cache_version
+
+    @property
+    def target_role_ids(self):
+        """Множество ID всех целевых ролей активных маппингов"""
+        return self._target_roles_set
+
+    @property
+    def mapped_source_server_ids(self):
+        """Множество ID исходных серверов с активными маппингами"""
+        return self._mapping_cache.keys()
+
+    def source_role_ids_for_server(self, source_server_id: int):
+        """
+        Получить ID исходных ролей с активными маппингами для сервера
+
+        Args:
+            source_server_id: ID исходного сервера
+
+        Returns:
+            Представление множества ID ролей (пустое если маппингов нет)
+        """
+        inner = self._mapping_cache.get(source_server_id)
+        return inner.keys() if inner is not None else frozenset()
 
     def is_target_role(self, role_id: int) -> bool:
         """
@@ -212,39 +412,39 @@ class RoleMapper:
             True если добавлен успешно
         """
         try:
-            # Создаем объект маппинга
-            mapping = RoleMapping(
-                id=mapping_id,
-                source_server_id=source_server_id,
-                source_role_id=source_role_id,
-                target_server_id=target_server_id,
-                target_role_id=target_role_id,
-                description=description,
-                enabled=enabled
-            )
+            async with self._writer_lock:
+                # Создаем объект маппинга
+                mapping = RoleMapping(
+                    id=mapping_id,
+                    source_server_id=source_server_id,
+                    source_role_id=source_role_id,
+                    target_server_id=target_server_id,
+                    target_role_id=target_role_id,
+                    description=description,
+                    enabled=enabled
+                )
 
-            # Добавляем в конфиг
-            self.config.add_role_mapping(mapping)
-
-            # Добавляем в БД
-            await self.db.cache_role_mapping(
-                mapping_id=mapping_id,
-                source_server_id=source_server_id,
-                source_role_id=source_role_id,
-                target_server_id=target_server_id,
-                target_role_id=target_role_id,
-                enabled=enabled,
-                description=description
-            )
+                # Добавляем в конфиг
+                self.config.add_role_mapping(mapping)
+
+                # Добавляем в БД
+                await self.db.cache_role_mapping(
+                    mapping_id=mapping_id,
+                    source_server_id=source_server_id,
+                    source_role_id=source_role_id,
+                    target_server_id=target_server_id,
+                    target_role_id=target_role_id,
+                    enabled=enabled,
+                    description=description
+                )
 
-            # Обновляем кеш в памяти
-            if enabled:
-                key = (source_server_id, source_role_id)
-                self._mapping_cache[key] = target_role_id
-                self._target_roles_set.add(target_role_id)
+                # Обновляем кеш в памяти
+                if enabled:
+                    self._insert_into_cache(source_server_id, source_role_id, target_role_id)
+
+                logger.info(f"Добавлен новый маппинг: {mapping_id}")
+                return True
 
-            logger.info(f"Добавлен новый маппинг: {mapping_id}")
-            return True
 
         except Exception as e:
             logger.error(f"Ошибка добавления маппинга: {e}", exc_info=True)
@@ -261,29 +461,25 @@ class RoleMapper:
             True если удален успешно
         """
         try:
-            # Получаем маппинг перед удалением
-            mapping = self.config.get_mapping_by_id(mapping_id)
-            if not mapping:
-                logger.warning(f"Маппинг {mapping_id} не найден")
-                return False
+            async with self._writer_lock:
+                # Получаем маппинг перед удалением
+                mapping = self.config.get_mapping_by_id(mapping_id)
+                if not mapping:
+                    logger.warning(f"Маппинг {mapping_id} не найден")
+                    return False
 
-            # Удаляем из конфига
-            self.config.remove_role_mapping(mapping_id)
+                # Удаляем из конфига
+                self.config.remove_role_mapping(mapping_id)
 
-            # Удаляем из БД
-            await self.db.remove_mapping(mapping_id)
+                # Удаляем из БД
+                await self.db.remove_mapping(mapping_id)
 
-            # Удаляем из кеша в памяти
-            key = (mapping.source_server_id, mapping.source_role_id)
-            removed_target = self._mapping_cache.pop(key, None)
+                # Удаляем из кеша в памяти (включая обратный индекс)
+                self._remove_from_cache(mapping.source_server_id, mapping.source_role_id)
 
-            # Обновляем обратный индекс - удаляем если больше нет ссылок на эту целевую роль
-            if removed_target is not None:
-                if removed_target not in self._mapping_cache.values():
-                    self._target_roles_set.discard(removed_target)
+                logger.info(f"Удален маппинг: {mapping_id}")
+                return True
 
-            logger.info(f"Удален маппинг: {mapping_id}")
-            return True
 
         except Exception as e:
             logger.error(f"Ошибка удаления маппинга: {e}", exc_info=True)
@@ -307,46 +503,38 @@ class RoleMapper:
             True если обновлен успешно
         """
         try:
-            # Получаем текущий маппинг
-            mapping = self.config.get_mapping_by_id(mapping_id)
-            if not mapping:
-                logger.warning(f"Маппинг {mapping_id} не найден")
-                return False
-
-            # Обновляем поля
-            if enabled is not None:
-                mapping.enabled = enabled
-            if description is not None:
-                mapping.description = description
-
-            # Обновляем в конфиге
-            self.config.update_role_mapping(mapping)
-
-            # Обновляем в БД
-            await self.db.cache_role_mapping(
-                mapping_id=mapping.id,
-                source_server_id=mapping.source_server_id,
-                source_role_id=mapping.source_role_id,
-                target_server_id=mapping.target_server_id,
-                target_role_id=mapping.target_role_id,
-                enabled=mapping.enabled,
-                description=mapping.description
-            )
-
-            # Обновляем кеш в памяти
-            key = (mapping.source_server_id, mapping.source_role_id)
-            if mapping.enabled:
-                self._mapping_cache[key] = mapping.target_role_id
-                self._target_roles_set.add(mapping.target_role_id)
-            else:
-                removed_target = self._mapping_cache.pop(key, None)
-                # Удаляем из обратного индекса если нет других ссылок
-                if removed_target is not None:
-                    if removed_target not in self._mapping_cache.values():
-                        self._target_roles_set.discard(removed_target)
+            async with self._writer_lock:
+                # Получаем текущий маппинг
+                mapping = self.config.get_mapping_by_id(mapping_id)
+                if not mapping:
+                    logger.warning(f"Маппинг {mapping_id} не найден")
+                    return False
+
+                # Обновляем поля
+                if enabled is not None:
+                    mapping.enabled = enabled
+                if description is not None:
+                    mapping.description = description
+
+                # Обновляем в конфиге
+                self.config.update_role_mapping(mapping)
+
+                # Обновляем в БД узкими UPDATE только измененных колонок -
+                # остальные поля маппинга не меняются через этот метод
+                if description is not None:
+                    await self.db.update_mapping_description(mapping_id, mapping.description)
+                if enabled is not None:
+                    await self.db.update_mapping_enabled(mapping_id, mapping.enabled)
+
+                    # Кеш зависит только от enabled (описание в нем не хранится)
+                    if mapping.enabled:
+                        self._insert_into_cache(mapping.source_server_id, mapping.source_role_id, mapping.target_role_id)
+                    else:
+                        self._remove_from_cache(mapping.source_server_id, mapping.source_role_id)
+
+                logger.info(f"Обновлен маппинг: {mapping_id}")
+                return True
 
-            logger.info(f"Обновлен маппинг: {mapping_id}")
-            return True
 
         except Exception as e:
             logger.error(f"Ошибка обновления маппинга: {e}", exc_info=True)
@@ -362,16 +550,24 @@ class RoleMapper:
         Returns:
             Список маппингов в виде словарей
         """
-        result = []
-        for (server_id, role_id), target_role_id in self._mapping_cache.items():
-            if server_id == source_server_id:
-                result.append({
-                    'source_server_id': server_id,
-                    'source_role_id': role_id,
-                    'target_role_id': target_role_id
-                })
-
-        return result
+        view = self._per_server_view.get(source_server_id)
+        if view is not None:
+            return view
+
+        inner = self._mapping_cache.get(source_server_id)
+        if not inner:
+            return []
+
+        view = [
+            {
+                'source_server_id': source_server_id,
+                'source_role_id': role_id,
+                'target_role_id': target_role_id
+            }
+            for role_id, target_role_id in inner.items()
+        ]
+        self._per_server_view[source_server_id] = view
+        return view
 
     def get_stats(self) -> Dict[str, int]:
         """
@@ -380,16 +576,13 @@ class RoleMapper:
         Returns:
             Словарь со статистикой
         """
-        all_mappings = self.config.get_all_role_mappings()
-        enabled_count = len(self._mapping_cache)
-        total_count = len(all_mappings)
-
-        # Подсчитываем количество уникальных серверов
-        unique_servers = set(key[0] for key in self._mapping_cache.keys())
+        enabled_count = self._cached_mapping_count()
+        total_count = self.config.get_mapping_count()
 
         return {
             'total_mappings': total_count,
             'enabled_mappings': enabled_count,
             'disabled_mappings': total_count - enabled_count,
-            'unique_source_servers': len(unique_servers)
+            # Ключи верхнего уровня кеша - это и есть уникальные сервера
+            'unique_source_servers': len(self._mapping_cache)
         }
@@ -4,12 +4,12 @@
 
 import discord
 import asyncio
+import time
 from typing import List, Dict, Tuple, Optional, Set
 from dataclasses import dataclass
 from datetime import datetime
 
 from bot.core.role_mapper import RoleMapper
-from bot.core.permissions import can_manage_role, get_manageable_roles
 from bot.database.operations import DatabaseOperations
 from bot.config import Config
 from bot.utils.logger import get_logger
@@ -18,16 +18,18 @@ from bot.utils.errors import SyncError, UserNotFoundError
 logger = get_logger("core.sync_engine")
 
 
-@dataclass
+@dataclass(slots=True)
 class SyncResult:
-    """Результат синхронизации"""
+    """Результат синхронизации (slots - меньше памяти при массовых синках)"""
     success: bool
     user_id: int
     roles_added: List[int]
     roles_removed: List[int]
     roles_failed: List[int]
     errors: List[str]
-    timestamp: datetime
+    # Эпоха в секундах: time.time() на порядок дешевле datetime.now()
+    # (нет резолва таймзоны) - заметно при массовых синках
+    timestamp_epoch: float
     source_servers: List[int]
     # Диагностическая информация
     source_roles_found: Optional[Dict[int, List[int]]] = None  # {server_id: [role_ids]}
@@ -36,8 +38,13 @@ class SyncResult:
 
     def __post_init__(self):
         """Установить timestamp если не задан"""
-        if not self.timestamp:
-            self.timestamp = datetime.now()
+        if not self.timestamp_epoch:
+            self.timestamp_epoch = time.time()
+
+    @property
+    def timestamp(self) -> datetime:
+        """Время синхронизации как datetime (конвертируется лениво для отображения)"""
+        return datetime.fromtimestamp(self.timestamp_epoch)
 
     @property
     def total_changes(self) -> int:
@@ -53,6 +60,9 @@ class SyncResult:
 class SyncEngine:
     """Движок для синхронизации ролей между серверами"""
 
+    # Время жизни кеша фан-аута по серверам (секунды)
+    _FANOUT_TTL = 5.0
+
     def __init__(
         self,
         bot: discord.Client,
@@ -73,6 +83,85 @@ class SyncEngine:
         self.config = config
         self.db = db
         self.role_mapper = role_mapper
+        # ID главного сервера неизменен на время жизни процесса -
+        # читаем из конфига один раз вместо вызова на каждую синхронизацию
+        self._main_server_id = config.get_main_server_id()
+        # Реестр выполняющихся синхронизаций: повторный вызов для того же
+        # пользователя ждет уже идущую задачу вместо дублирования работы
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        # Очередь событий для фонового логирования; создается лениво
+        # при первом событии (нужен работающий event loop)
+        self._log_queue: Optional[asyncio.Queue] = None
+        self._log_flusher_task: Optional[asyncio.Task] = None
+        # Буферы статистики и sync_state: инкременты копятся в памяти
+        # и уходят в БД одним запросом раз в несколько секунд
+        self._stats_buf = {
+            "total": 0, "button": 0, "auto": 0, "manual": 0,
+            "success": 0, "failed": 0, "roles": 0
+        }
+        self._pending_sync_states: set = set()
+        self._stats_flusher_task: Optional[asyncio.Task] = None
+        # Мемоизация calculate_target_roles: многие пользователи имеют
+        # одинаковые наборы исходных ролей (ключ - пары + версия маппингов)
+        self._target_roles_memo: Dict[frozenset, Tuple[int, frozenset]] = {}
+        # Короткий TTL-кеш фан-аута по серверам: смежные вызовы для одного
+        # пользователя (sync + mutual guilds) не повторяют выборку
+        self._fanout_cache: Dict[int, Tuple[float, tuple]] = {}
+        # Кеш управляемых ботом ролей по серверам:
+        # guild_id -> (позиция top-роли бота, frozenset ID ролей).
+        # Сбрасывается слушателями событий изменения ролей
+        self._manageable_cache: Dict[int, Tuple[int, frozenset]] = {}
+        if hasattr(bot, "add_listener"):
+            bot.add_listener(self._on_guild_role_create, "on_guild_role_create")
+            bot.add_listener(self._on_guild_role_update, "on_guild_role_update")
+            bot.add_listener(self._on_guild_role_delete, "on_guild_role_delete")
+
+    @property
+    def main_guild(self) -> Optional[discord.Guild]:
+        """Главный сервер (None если бот на нем не находится)"""
+        return self.bot.get_guild(self._main_server_id)
+
+    async def _on_guild_role_create(self, role: discord.Role):
+        """Сбросить кеш управляемых ролей при создании роли"""
+        self._manageable_cache.pop(role.guild.id, None)
+
+    async def _on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        """Сбросить кеш управляемых ролей при изменении роли"""
+        self._manageable_cache.pop(after.guild.id, None)
+
+    async def _on_guild_role_delete(self, role: discord.Role):
+        """Сбросить кеш управляемых ролей при удалении роли"""
+        self._manageable_cache.pop(role.guild.id, None)
+
+    def _get_manageable_role_ids(self, guild: discord.Guild) -> frozenset:
+        """
+        Получить множество ID ролей, которыми бот может управлять на сервере
+
+        Результат кешируется по позиции top-роли бота; пересчет происходит
+        при изменении ролей сервера (слушатели) или перемещении роли бота.
+
+        Args:
+            guild: Объект сервера
+
+        Returns:
+            frozenset ID управляемых ролей
+        """
+        bot_member = guild.me
+        if not bot_member or not bot_member.guild_permissions.manage_roles:
+            return frozenset()
+
+        top_position = bot_member.top_role.position
+        cached = self._manageable_cache.get(guild.id)
+        if cached is not None and cached[0] == top_position:
+            return cached[1]
+
+        bot_top_role = bot_member.top_role
+        manageable = frozenset(
+            role.id for role in guild.roles
+            if role < bot_top_role and not role.managed and not role.is_default()
+        )
+        self._manageable_cache[guild.id] = (top_position, manageable)
+        return manageable
 
     async def sync_user_roles(
         self,
@@ -80,7 +169,7 @@ class SyncEngine:
         trigger_type: str = "manual",
         *,
         member: Optional[discord.Member] = None,
-        source_members_cache: Optional[Dict[tuple, discord.Member]] = None,
+        source_members_cache: Optional[Dict[int, List[Tuple[discord.Guild, Tuple[int, ...]]]]] = None,
         batch_db_ops: Optional[list] = None
     ) -> SyncResult:
         """
@@ -90,13 +179,46 @@ class SyncEngine:
             user_id: ID пользователя Discord
             trigger_type: Тип триггера (button/auto/manual)
             member: Готовый объект Member (пропускает fetch_member на main-сервере)
-            source_members_cache: Кеш участников source-серверов {(guild_id, user_id): Member}
+            source_members_cache: Кеш ролей на source-серверах {user_id: [(Guild, role_ids), ...]}
             batch_db_ops: Если передан — складывать DB-операции туда вместо немедленного выполнения
 
         Returns:
             Объект SyncResult с результатами синхронизации
         """
-        logger.info(f"Начало синхронизации для пользователя {user_id} (триггер: {trigger_type})")
+        # Слияние конкурентных вызовов для одного пользователя; батчевые
+        # вызовы (с готовым member/кешем) не коалесцируем - их контекст
+        # различается и дубликатов по пользователю там не бывает
+        if member is None and source_members_cache is None and batch_db_ops is None:
+            existing = self._in_flight.get(user_id)
+            if existing is not None:
+                logger.debug("Синхронизация %d уже выполняется, ждем результат", user_id)
+                return await asyncio.shield(existing)
+
+            task = asyncio.ensure_future(self._sync_user_roles_impl(user_id, trigger_type))
+            self._in_flight[user_id] = task
+            try:
+                return await task
+            finally:
+                self._in_flight.pop(user_id, None)
+
+        return await self._sync_user_roles_impl(
+            user_id, trigger_type,
+            member=member,
+            source_members_cache=source_members_cache,
+            batch_db_ops=batch_db_ops
+        )
+
+    async def _sync_user_roles_impl(
+        self,
+        user_id: int,
+        trigger_type: str = "manual",
+        *,
+        member: Optional[discord.Member] = None,
+        source_members_cache: Optional[Dict[int, List[Tuple[discord.Guild, Tuple[int, ...]]]]] = None,
+        batch_db_ops: Optional[list] = None
+    ) -> SyncResult:
+        """Тело синхронизации пользователя (см. sync_user_roles)"""
+        logger.info("Начало синхронизации для пользователя %d (триггер: %s)", user_id, trigger_type)
 
         result = SyncResult(
             success=False,
@@ -105,14 +227,14 @@ class SyncEngine:
             roles_removed=[],
             roles_failed=[],
             errors=[],
-            timestamp=datetime.now(),
+            timestamp_epoch=0.0,
             source_servers=[]
         )
 
         try:
             # 1. Получаем главный сервер
-            main_server_id = self.config.get_main_server_id()
-            main_guild = self.bot.get_guild(main_server_id)
+            main_server_id = self._main_server_id
+            main_guild = self.main_guild
 
             if not main_guild:
                 error_msg = f"Главный сервер {main_server_id} не найден"
@@ -122,8 +244,11 @@ class SyncEngine:
                 return result
 
             # 2. Получаем пользователя на главном сервере
+            # (сначала кеш - HTTP только на промах)
             if member is not None:
                 main_member = member
+            elif (cached_member := main_guild.get_member(user_id)) is not None:
+                main_member = cached_member
             else:
                 try:
                     main_member = await main_guild.fetch_member(user_id)
@@ -142,17 +267,25 @@ class SyncEngine:
             else:
                 mutual_guilds, user_roles_map, fetch_errors = await self.get_user_roles_from_all_guilds(user_id)
 
-            logger.info(f"Пользователь найден на {len(mutual_guilds)} общих серверах")
+            logger.info("Пользователь найден на %d общих серверах", len(mutual_guilds))
 
             # Запоминаем ошибки получения данных с серверов
             if fetch_errors:
                 result.errors.extend(fetch_errors)
 
             if not mutual_guilds and not fetch_errors:
-                logger.info(f"Пользователь {user_id} не найден ни на одном из мониторимых серверов")
-                result.success = True
-                await self._log_sync_event(user_id, "sync_success", trigger_type, True)
-                return result
+                # Ранний выход только если снимать тоже нечего: у пользователя
+                # могли остаться устаревшие замапленные роли - тогда
+                # проваливаемся в обычный путь, где пустой target их снимет
+                if not (self._current_role_ids(main_member) & self.role_mapper.target_role_ids):
+                    logger.info("Пользователь %d не найден ни на одном из мониторимых серверов", user_id)
+                    result.success = True
+                    await self._log_sync_event(user_id, "sync_success", trigger_type, True)
+                    return result
+                logger.info(
+                    f"Пользователь {user_id} не найден на source-серверах, "
+                    f"но имеет устаревшие замапленные роли - снимаем"
+                )
 
             # Если не удалось получить данные ни с одного сервера из-за ошибок
             if not mutual_guilds and fetch_errors:
@@ -169,18 +302,36 @@ class SyncEngine:
 
             # 5. Вычисляем какие целевые роли должны быть
             target_role_ids = await self.calculate_target_roles(user_roles_map)
-            result.target_roles_calculated = target_role_ids
-            logger.info(f"Рассчитано {len(target_role_ids)} целевых ролей для назначения")
+            result.target_roles_calculated = list(target_role_ids)
+            logger.info("Рассчитано %d целевых ролей для назначения", len(target_role_ids))
 
-            # Сохраняем текущие роли пользователя на главном сервере
-            result.current_roles = [role.id for role in main_member.roles if not role.is_default()]
+            # Текущие роли на главном сервере считаем один раз: и для
+            # диагностики, и для расчета разницы в calculate_role_changes
+            current_role_ids = self._current_role_ids(main_member)
+            result.current_roles = list(current_role_ids)
 
             # 6. Определяем какие роли нужно добавить/удалить
             roles_to_add, roles_to_remove, unmanageable_role_ids = await self.calculate_role_changes(
                 main_member,
-                target_role_ids
+                target_role_ids,
+                current_role_ids
             )
 
+            # Ничего менять не нужно - пропускаем HTTP-запросы и тяжелые
+            # DB-записи (статистику, sync_state, сессию): при периодических
+            # ресинках это подавляющее большинство случаев
+            if not roles_to_add and not roles_to_remove and not unmanageable_role_ids and not fetch_errors:
+                result.success = True
+                # sync_success, а не отдельный тип: CHECK-ограничение
+                # sync_logs.action_type знает только стандартные типы
+                noop_entry = ("log_sync_event", (user_id, "sync_success", trigger_type, True))
+                if batch_db_ops is not None:
+                    batch_db_ops.append(noop_entry)
+                else:
+                    await self._log_sync_event(user_id, "sync_success", trigger_type, True)
+                logger.info("Синхронизация %d: изменений нет", user_id)
+                return result
+
             # 7. Применяем изменения
             apply_success, actually_added, failed_to_add = await self.apply_role_changes(
                 main_member,
@@ -202,32 +353,24 @@ class SyncEngine:
             has_failures = len(all_failed) > 0 or len(fetch_errors) > 0
             result.success = not has_failures
 
-            # 8. Логируем результат
+            # 8. Логируем результат; статистика копится в памяти и уходит
+            # одним агрегированным UPSERT на flush - и в одиночном, и в
+            # массовом режиме вместо per-user строки в батче
             status_type = "sync_success" if result.success else "sync_failed"
-            log_entry = ("log_sync_event", (user_id, status_type, trigger_type, result.success))
-            state_entry = ("update_sync_state", (user_id, main_server_id))
-            stats_entry = ("update_statistics", (trigger_type, result.success, len(actually_added), user_id))
+            self._buffer_statistics(trigger_type, result.success, len(actually_added))
 
             if batch_db_ops is not None:
-                batch_db_ops.append(log_entry)
+                batch_db_ops.append(("log_sync_event", (user_id, status_type, trigger_type, result.success)))
                 if result.success:
-                    batch_db_ops.append(state_entry)
-                batch_db_ops.append(stats_entry)
+                    batch_db_ops.append(("update_sync_state", (user_id, main_server_id)))
             else:
                 await self._log_sync_event(user_id, status_type, trigger_type, result.success)
                 if result.success:
-                    await self.db.update_sync_state(user_id, main_server_id)
-                await self.db.update_statistics(
-                    trigger_type=trigger_type,
-                    success=result.success,
-                    roles_assigned=len(actually_added),
-                    user_id=user_id
-                )
+                    self._pending_sync_states.add((user_id, main_server_id))
 
             logger.info(
-                f"Синхронизация завершена для {user_id}: "
-                f"+{len(actually_added)} ролей, -{len(roles_to_remove)} ролей, "
-                f"не удалось: {len(all_failed)}"
+                "Синхронизация завершена для %d: +%d ролей, -%d ролей, не удалось: %d",
+                user_id, len(actually_added), len(roles_to_remove), len(all_failed)
             )
 
         except UserNotFoundError:
@@ -282,6 +425,12 @@ class SyncEngine:
         Raises:
             Exception: При transient-ошибках (сеть, rate limit и т.д.)
         """
+        # Сначала кеш: при включенном members-интенте участник обычно уже
+        # в памяти - HTTP-запрос нужен только на промах
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+
         try:
             return await guild.fetch_member(user_id)
         except discord.NotFound:
@@ -290,7 +439,7 @@ class SyncEngine:
     async def get_user_roles_from_all_guilds(
         self,
         user_id: int
-    ) -> Tuple[List[discord.Guild], Dict[int, List[int]], List[str]]:
+    ) -> Tuple[List[discord.Guild], Dict[int, List[int]], Tuple[str, ...]]:
         """
         Получить роли пользователя со всех серверов (параллельно)
 
@@ -298,56 +447,114 @@ class SyncEngine:
             user_id: ID пользователя
 
         Returns:
-            Кортеж (список серверов где найден, словарь {server_id: [role_ids]}, список ошибок)
+            Кортеж (список серверов где найден, словарь {server_id: [role_ids]},
+            кортеж ошибок - неизменяемый, безопасен для TTL-кеша)
         """
-        main_server_id = self.config.get_main_server_id()
-
-        # Фильтруем сервера (исключаем главный)
-        guilds_to_check = [g for g in self.bot.guilds if g.id != main_server_id]
-
-        if not guilds_to_check:
-            return [], {}, []
-
-        # Параллельно запрашиваем всех участников
-        tasks = [self._fetch_member_safe(guild, user_id) for guild in guilds_to_check]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Свежий результат из TTL-кеша - без повторного фан-аута
+        cached = self._fanout_cache.get(user_id)
+        if cached is not None and asyncio.get_event_loop().time() - cached[0] < self._FANOUT_TTL:
+            return cached[1]
+
+        main_server_id = self._main_server_id
+        mapped_server_ids = self.role_mapper.mapped_source_server_ids
+
+        # Фильтруем сервера: исключаем главный и сервера без единого
+        # активного маппинга - фан-аут только туда, где есть что собирать.
+        # Кешированные участники отделяются сразу - HTTP только на промахи
+        pairs = []
+        to_fetch = []
+        for guild in self.bot.guilds:
+            if guild.id == main_server_id or guild.id not in mapped_server_ids:
+                continue
+            cached = guild.get_member(user_id)
+            if cached is not None:
+                pairs.append((guild, cached))
+            else:
+                to_fetch.append(guild)
+
+        # Голые fetch_member-корутины под return_exceptions=True: NotFound
+        # обрабатывается веткой в цикле, без try/except-обертки на сервер
+        if to_fetch:
+            results = await asyncio.gather(
+                *(guild.fetch_member(user_id) for guild in to_fetch),
+                return_exceptions=True
+            )
+            pairs.extend(zip(to_fetch, results))
 
         mutual_guilds = []
         user_roles_map = {}
         fetch_errors = []
 
-        for guild, result in zip(guilds_to_check, results):
+        for guild, result in pairs:
+            if isinstance(result, discord.NotFound):
+                continue
             if isinstance(result, Exception):
                 error_msg = f"Ошибка получения данных с сервера {guild.name}: {result}"
                 logger.warning(error_msg)
                 fetch_errors.append(error_msg)
                 continue
 
-            member = result
-            if member is not None:
-                mutual_guilds.append(guild)
-                # Получаем все роли кроме @everyone
-                role_ids = [role.id for role in member.roles if not role.is_default()]
-                if role_ids:
-                    user_roles_map[guild.id] = role_ids
-                    logger.debug(
-                        f"Пользователь имеет {len(role_ids)} ролей на сервере {guild.name}"
-                    )
+            mutual_guilds.append(guild)
+            # Получаем все роли кроме @everyone
+            role_ids = [role.id for role in result.roles if not role.is_default()]
+            if role_ids:
+                user_roles_map[guild.id] = role_ids
+                logger.debug(
+                    "Пользователь имеет %d ролей на сервере %s", len(role_ids), guild.name
+                )
+
+        logger.debug("Пользователь найден на %d серверах (параллельный запрос)", len(mutual_guilds))
+
+        fetch_errors = tuple(fetch_errors)
+
+        # Кешируем только чистые результаты: ошибки должны переповториться
+        if not fetch_errors:
+            if len(self._fanout_cache) >= 1024:
+                self._fanout_cache.clear()
+            self._fanout_cache[user_id] = (
+                asyncio.get_event_loop().time(),
+                (mutual_guilds, user_roles_map, fetch_errors)
+            )
 
-        logger.debug(f"Пользователь найден на {len(mutual_guilds)} серверах (параллельный запрос)")
         return mutual_guilds, user_roles_map, fetch_errors
 
     async def get_user_mutual_guilds(self, user_id: int) -> List[discord.Guild]:
         """
         Получить все сервера где есть и пользователь, и бот
 
+        Легкий путь: сперва кеш участников (get_member), HTTP-запрос
+        только на промах - без сбора карты ролей, которая здесь не нужна.
+
+        Фан-аут-кеш здесь не используется: он покрывает только сервера
+        с активными маппингами, а эта диагностика должна видеть все.
+
         Args:
             user_id: ID пользователя
 
         Returns:
             Список объектов Guild
         """
-        mutual_guilds, _, _ = await self.get_user_roles_from_all_guilds(user_id)
+        main_server_id = self._main_server_id
+        mutual_guilds = []
+        to_fetch = []
+
+        for guild in self.bot.guilds:
+            if guild.id == main_server_id:
+                continue
+            if guild.get_member(user_id) is not None:
+                mutual_guilds.append(guild)
+            else:
+                to_fetch.append(guild)
+
+        if to_fetch:
+            tasks = [self._fetch_member_safe(guild, user_id) for guild in to_fetch]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for guild, result in zip(to_fetch, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Ошибка получения данных с сервера {guild.name}: {result}")
+                elif result is not None:
+                    mutual_guilds.append(guild)
+
         return mutual_guilds
 
     async def get_user_roles_from_guilds(
@@ -368,13 +575,17 @@ class SyncEngine:
         if not guilds:
             return {}
 
-        # Параллельно запрашиваем всех участников
-        tasks = [self._fetch_member_safe(guild, user_id) for guild in guilds]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Параллельно запрашиваем всех участников без try/except-обертки
+        results = await asyncio.gather(
+            *(guild.fetch_member(user_id) for guild in guilds),
+            return_exceptions=True
+        )
 
         user_roles_map = {}
 
         for guild, result in zip(guilds, results):
+            if isinstance(result, discord.NotFound):
+                continue
             if isinstance(result, Exception):
                 logger.warning(f"Ошибка получения данных с сервера {guild.name}: {result}")
                 continue
@@ -384,7 +595,7 @@ class SyncEngine:
                 if role_ids:
                     user_roles_map[guild.id] = role_ids
                     logger.debug(
-                        f"Пользователь имеет {len(role_ids)} ролей на сервере {guild.name}"
+                        "Пользователь имеет %d ролей на сервере %s", len(role_ids), guild.name
                     )
 
         return user_roles_map
@@ -392,7 +603,7 @@ class SyncEngine:
     async def calculate_target_roles(
         self,
         user_roles_map: Dict[int, List[int]]
-    ) -> List[int]:
+    ) -> frozenset:
         """
         Вычислить какие целевые роли должны быть назначены
 
@@ -400,39 +611,80 @@ class SyncEngine:
             user_roles_map: Словарь {server_id: [role_ids]}
 
         Returns:
-            Список ID целевых ролей
+            Неизменяемое множество ID целевых ролей
         """
-        # Собираем все пары (server_id, role_id)
-        source_roles = []
-        for server_id, role_ids in user_roles_map.items():
-            for role_id in role_ids:
-                source_roles.append((server_id, role_id))
+        # Отбрасываем немаппированные роли еще до обращения к мапперу:
+        # сервера без маппингов пропускаются целиком, с остальных берутся
+        # только роли, входящие в исходный индекс
+        source_roles = frozenset(
+            (server_id, role_id)
+            for server_id, role_ids in user_roles_map.items()
+            if (mapped_ids := self.role_mapper.source_role_ids_for_server(server_id))
+            for role_id in role_ids
+            if role_id in mapped_ids
+        )
+
+        # Мемоизация по каноничному ключу: при массовой синхронизации
+        # одинаковые наборы исходных ролей встречаются у тысяч пользователей
+        version = self.role_mapper.cache_version
+        cached = self._target_roles_memo.get(source_roles)
+        if cached is not None and cached[0] == version:
+            return cached[1]
 
-        # Получаем все целевые роли через RoleMapper
-        target_role_ids = self.role_mapper.get_all_target_roles(source_roles)
+        # Получаем все целевые роли через RoleMapper; frozenset сразу
+        # пригоден для разностных операций в calculate_role_changes
+        target_role_ids = frozenset(self.role_mapper.get_all_target_roles(source_roles))
+
+        if len(self._target_roles_memo) >= 4096:
+            self._target_roles_memo.clear()
+        self._target_roles_memo[source_roles] = (version, target_role_ids)
 
         return target_role_ids
 
+    def _current_role_ids(self, member: discord.Member) -> frozenset:
+        """
+        Собрать ID текущих ролей участника без @everyone
+
+        @everyone гарантированно первый в списке (id == guild.id) -
+        срез дешевле вызова is_default() на каждую роль.
+
+        Args:
+            member: Объект участника
+
+        Returns:
+            frozenset ID ролей
+        """
+        roles = member.roles
+        if roles and roles[0].id == member.guild.id:
+            return frozenset(role.id for role in roles[1:])
+        return frozenset(role.id for role in roles if not role.is_default())
+
     async def calculate_role_changes(
         self,
         member: discord.Member,
-        target_role_ids: List[int]
+        target_role_ids: Set[int],
+        current_role_ids: Optional[frozenset] = None
     ) -> Tuple[List[discord.Role], List[discord.Role], List[int]]:
         """
         Определить какие роли нужно добавить/удалить
 
         Args:
             member: Объект участника на главном сервере
-            target_role_ids: Список ID целевых ролей
+            target_role_ids: Множество ID целевых ролей
+            current_role_ids: Готовое множество текущих ролей
+                (None = вычислить по member.roles)
 
         Returns:
             Кортеж (роли_для_добавления, роли_для_удаления, ID_ролей_которые_не_удалось_обработать)
         """
-        # Получаем текущие роли пользователя (только управляемые ботом)
-        current_role_ids = set(role.id for role in member.roles if not role.is_default())
+        if current_role_ids is None:
+            current_role_ids = self._current_role_ids(member)
 
-        # Целевые роли
-        target_role_ids_set = set(target_role_ids)
+        # Целевые роли (уже frozenset из calculate_target_roles)
+        target_role_ids_set = (
+            target_role_ids if isinstance(target_role_ids, frozenset)
+            else frozenset(target_role_ids)
+        )
 
         # Вычисляем разницу
         roles_to_add_ids = target_role_ids_set - current_role_ids
@@ -443,41 +695,34 @@ class SyncEngine:
         roles_to_remove = []
         unmanageable_roles = []
 
+        # Пересечение с кешированным множеством управляемых ролей -
+        # вместо повторного прохода по guild.roles на каждый вызов
+        manageable_ids = self._get_manageable_role_ids(member.guild) if (roles_to_add_ids or roles_to_remove_ids) else frozenset()
+
         # Получаем управляемые роли для добавления
         if roles_to_add_ids:
-            manageable_add, unmanageable_add = await get_manageable_roles(
-                member.guild,
-                list(roles_to_add_ids)
-            )
-            roles_to_add = manageable_add
-            unmanageable_roles = unmanageable_add
+            roles_to_add = [member.guild.get_role(role_id) for role_id in roles_to_add_ids & manageable_ids]
+            unmanageable_roles = list(roles_to_add_ids - manageable_ids)
 
-            if unmanageable_add:
+            if unmanageable_roles:
                 logger.warning(
-                    f"Не удалось добавить {len(unmanageable_add)} ролей "
-                    f"(нет прав или роли не найдены): {unmanageable_add}"
+                    f"Не удалось добавить {len(unmanageable_roles)} ролей "
+                    f"(нет прав или роли не найдены): {unmanageable_roles}"
                 )
 
         # Получаем управляемые роли для удаления
         # ВАЖНО: удаляем только те роли, которые были добавлены через синхронизацию
-        # Используем обратный индекс для O(1) проверки
         if roles_to_remove_ids:
-            # Фильтруем только роли, которые есть в наших маппингах (O(1) через is_target_role)
-            mapped_role_ids = [
-                role_id for role_id in roles_to_remove_ids
-                if self.role_mapper.is_target_role(role_id)
+            # Только роли из наших маппингов, и только управляемые ботом:
+            # двойное пересечение множеств выполняется целиком в C
+            roles_to_remove = [
+                member.guild.get_role(role_id)
+                for role_id in roles_to_remove_ids & manageable_ids & self.role_mapper.target_role_ids
             ]
 
-            if mapped_role_ids:
-                manageable_remove, _ = await get_manageable_roles(
-                    member.guild,
-                    mapped_role_ids
-                )
-                roles_to_remove = manageable_remove
-
         logger.debug(
-            f"Изменения ролей: +{len(roles_to_add)}, -{len(roles_to_remove)}, "
-            f"неуправляемых: {len(unmanageable_roles)}"
+            "Изменения ролей: +%d, -%d, неуправляемых: %d",
+            len(roles_to_add), len(roles_to_remove), len(unmanageable_roles)
         )
 
         return roles_to_add, roles_to_remove, unmanageable_roles
@@ -508,19 +753,60 @@ class SyncEngine:
         """
         actually_added = []
         failed_to_add = []
+        removal_success = False
+
+        # Все DB-записи копим в один список: при отсутствии внешнего батча
+        # он уходит в БД одной транзакцией (один commit вместо N)
+        local_flush = batch_db_ops is None
+        db_ops = [] if local_flush else batch_db_ops
+
+        # Предполетная проверка иерархии: роли на уровне или выше роли бота
+        # отсекаются веткой, а не исключением discord.Forbidden из API -
+        # в устоявшемся режиме exception-путь становится недостижимым
+        if (roles_to_add or roles_to_remove) and member.guild.me is not None:
+            bot_top_position = member.guild.me.top_role.position
+
+            too_high = [role for role in roles_to_add if role.position >= bot_top_position]
+            if too_high:
+                logger.warning(
+                    f"Роли выше роли бота пропущены для {member.id}: "
+                    f"{[role.name for role in too_high]}"
+                )
+                failed_to_add.extend(too_high)
+                roles_to_add = [role for role in roles_to_add if role.position < bot_top_position]
+
+            roles_to_remove = [role for role in roles_to_remove if role.position < bot_top_position]
+
+        # Применяем добавление и удаление одним PATCH: member.edit(roles=...)
+        # выставляет полный список ролей атомарно - один HTTP-запрос вместо
+        # отдельных add_roles/remove_roles
+        if roles_to_add or roles_to_remove:
+            # Причина аудит-лога строится один раз - в Forbidden-fallback
+            # она иначе аллоцировалась бы заново на каждую роль
+            sync_reason = f"Role sync ({trigger_type})"
+            remove_ids = {role.id for role in roles_to_remove}
+            add_ids = {role.id for role in roles_to_add}
+            final_roles = [
+                role for role in member.roles
+                if not role.is_default()
+                and role.id not in remove_ids
+                and role.id not in add_ids
+            ] + list(roles_to_add)
 
-        # Добавляем роли (batch — все сразу одним API-вызовом)
-        if roles_to_add:
             try:
-                await member.add_roles(*roles_to_add, reason=f"Role sync ({trigger_type})")
+                await member.edit(roles=final_roles, reason=sync_reason)
                 actually_added = list(roles_to_add)
-                logger.info(f"Добавлено {len(roles_to_add)} ролей пользователю {member.id}")
+                removal_success = bool(roles_to_remove)
+                logger.info(
+                    f"Применены изменения ролей для {member.id}: "
+                    f"+{len(roles_to_add)}, -{len(roles_to_remove)} (один запрос)"
+                )
             except discord.Forbidden:
-                # Fallback: по одной, чтобы определить какая именно не выдалась
-                logger.warning(f"Batch add_roles не удался для {member.id}, пробуем по одной")
+                # Fallback: добавляем по одной, чтобы определить какая именно не выдалась
+                logger.warning(f"Пакетный member.edit не удался для {member.id}, пробуем по одной")
                 for role in roles_to_add:
                     try:
-                        await member.add_roles(role, reason=f"Role sync ({trigger_type})")
+                        await member.add_roles(role, reason=sync_reason)
                         actually_added.append(role)
                     except discord.Forbidden:
                         error_msg = f"Нет прав для добавления роли {role.name}"
@@ -529,87 +815,75 @@ class SyncEngine:
                     except Exception as e:
                         logger.error(f"Ошибка добавления роли {role.name}: {e}", exc_info=True)
                         failed_to_add.append(role)
-            except Exception as e:
-                logger.error(f"Ошибка пакетного добавления ролей для {member.id}: {e}", exc_info=True)
+
+                if roles_to_remove:
+                    try:
+                        await member.remove_roles(*roles_to_remove, reason=f"Role sync cleanup ({trigger_type})")
+                        removal_success = True
+                    except discord.Forbidden:
+                        logger.error(f"Нет прав для удаления ролей у {member.id}")
+                    except Exception as e:
+                        logger.error(f"Ошибка пакетного удаления ролей для {member.id}: {e}", exc_info=True)
+            except discord.HTTPException as e:
+                logger.error(f"Ошибка применения изменений ролей для {member.id}: {e}", exc_info=True)
                 failed_to_add = list(roles_to_add)
 
         # DB-логирование добавленных ролей
+        # Роли пользователя по серверам как множества - O(1) проверка вхождения
+        user_roles_sets = {
+            server_id: set(role_ids)
+            for server_id, role_ids in user_roles_map.items()
+        } if actually_added else {}
+
+        # Связанный метод в локальную переменную - без повторного
+        # attribute-lookup на каждую добавленную роль
+        get_sources = self.role_mapper.get_sources_for_target
+
+        # Одним проходом находим активную исходную пару для каждой целевой
+        # роли (первое совпадение выигрывает) - цикл логирования ниже
+        # сводится к одному dict-lookup на роль
+        active_source_for_target: Dict[int, Tuple[int, int]] = {}
+        for role in actually_added:
+            for source_server_id, source_role_id in get_sources(role.id):
+                roles_on_server = user_roles_sets.get(source_server_id)
+                if roles_on_server is not None and source_role_id in roles_on_server:
+                    active_source_for_target[role.id] = (source_server_id, source_role_id)
+                    break
+
         for role in actually_added:
-            log_entry = ("log_sync_event", (
+            db_ops.append(("log_sync_event", (
                 member.id, "role_added", trigger_type, True,
                 member.guild.id, role.id
-            ))
-
-            # Находим исходный сервер и роль для записи назначения
-            assignment_entry = None
-            for source_server_id, source_role_ids in user_roles_map.items():
-                for source_role_id in source_role_ids:
-                    target_role = self.role_mapper.get_target_role(source_server_id, source_role_id)
-                    if target_role == role.id:
-                        assignment_entry = ("record_role_assignment", (
-                            member.id, source_server_id, source_role_id,
-                            member.guild.id, role.id, trigger_type
-                        ))
-                        break
-                if assignment_entry:
-                    break
+            )))
 
-            if batch_db_ops is not None:
-                batch_db_ops.append(log_entry)
-                if assignment_entry:
-                    batch_db_ops.append(assignment_entry)
-            else:
-                await self.db.log_sync_event(
-                    user_id=member.id, action_type="role_added",
-                    trigger_type=trigger_type, success=True,
-                    target_server_id=member.guild.id, target_role_id=role.id
-                )
-                if assignment_entry:
-                    _, params = assignment_entry
-                    await self.db.record_role_assignment(*params)
+            source_pair = active_source_for_target.get(role.id)
+            if source_pair:
+                db_ops.append(("record_role_assignment", (
+                    member.id, source_pair[0], source_pair[1],
+                    member.guild.id, role.id, trigger_type
+                )))
 
         # DB-логирование неудавшихся ролей
         for role in failed_to_add:
             error_msg = f"Нет прав для добавления роли {role.name}"
-            log_entry = ("log_sync_event", (
+            db_ops.append(("log_sync_event", (
                 member.id, "role_added", trigger_type, False,
                 member.guild.id, role.id, error_msg
-            ))
-            if batch_db_ops is not None:
-                batch_db_ops.append(log_entry)
-            else:
-                await self.db.log_sync_event(
-                    user_id=member.id, action_type="role_added",
-                    trigger_type=trigger_type, success=False,
-                    target_role_id=role.id, error_message=error_msg
-                )
+            )))
 
-        # Удаляем роли (batch — все сразу одним API-вызовом)
-        removal_success = False
-        if roles_to_remove:
+        # DB-логирование удаления — success отражает итог фактического PATCH
+        for role in roles_to_remove:
+            db_ops.append(("log_sync_event", (
+                member.id, "role_removed", trigger_type, removal_success,
+                member.guild.id, role.id
+            )))
+
+        # Без внешнего батча — сбрасываем накопленное одной транзакцией
+        if local_flush and db_ops:
             try:
-                await member.remove_roles(*roles_to_remove, reason=f"Role sync cleanup ({trigger_type})")
-                logger.info(f"Удалено {len(roles_to_remove)} ролей у пользователя {member.id}")
-                removal_success = True
-            except discord.Forbidden:
-                logger.error(f"Нет прав для удаления ролей у {member.id}")
+                await self.db.execute_batch(db_ops)
             except Exception as e:
-                logger.error(f"Ошибка пакетного удаления ролей для {member.id}: {e}", exc_info=True)
-
-            # DB-логирование — только если удаление реально прошло
-            for role in roles_to_remove:
-                log_entry = ("log_sync_event", (
-                    member.id, "role_removed", trigger_type, removal_success,
-                    member.guild.id, role.id
-                ))
-                if batch_db_ops is not None:
-                    batch_db_ops.append(log_entry)
-                else:
-                    await self.db.log_sync_event(
-                        user_id=member.id, action_type="role_removed",
-                        trigger_type=trigger_type, success=removal_success,
-                        target_server_id=member.guild.id, target_role_id=role.id
-                    )
+                logger.error(f"Ошибка пакетной записи событий синхронизации: {e}", exc_info=True)
 
         success = len(failed_to_add) == 0
         return success, actually_added, failed_to_add
@@ -617,72 +891,90 @@ class SyncEngine:
     def _get_roles_from_cache(
         self,
         user_id: int,
-        source_members_cache: Dict[tuple, discord.Member]
-    ) -> Tuple[List[discord.Guild], Dict[int, List[int]], List[str]]:
+        source_members_cache: Dict[int, List[Tuple[discord.Guild, Tuple[int, ...]]]]
+    ) -> Tuple[List[discord.Guild], Dict[int, List[int]], Tuple[str, ...]]:
         """
         Получить роли пользователя из предзагруженного кеша (без API-вызовов).
 
+        Кеш индексирован по user_id, поэтому поиск - один dict-lookup;
+        ID ролей отфильтрованы еще на этапе предзагрузки, так что здесь
+        не остается ни одной итерации по member.roles.
+
         Args:
             user_id: ID пользователя
-            source_members_cache: Кеш {(guild_id, user_id): Member}
+            source_members_cache: Кеш {user_id: [(Guild, role_ids), ...]}
 
         Returns:
-            Кортеж (список серверов, словарь ролей, список ошибок)
+            Кортеж (список серверов, словарь ролей, кортеж ошибок)
         """
         mutual_guilds = []
         user_roles_map = {}
 
-        for (guild_id, cached_user_id), cached_member in source_members_cache.items():
-            if cached_user_id != user_id:
-                continue
-            role_ids = [r.id for r in cached_member.roles if not r.is_default()]
-            if role_ids:
-                user_roles_map[guild_id] = role_ids
-                mutual_guilds.append(cached_member.guild)
+        for guild, role_ids in source_members_cache.get(user_id, ()):
+            user_roles_map[guild.id] = role_ids
+            mutual_guilds.append(guild)
 
-        return mutual_guilds, user_roles_map, []
+        return mutual_guilds, user_roles_map, ()
 
     async def _prefetch_source_members(
         self,
-        target_members: List[discord.Member]
-    ) -> Dict[tuple, discord.Member]:
+        target_members: Optional[List[discord.Member]] = None
+    ) -> Dict[int, List[Tuple[discord.Guild, Tuple[int, ...]]]]:
         """
         Предзагрузить участников со всех source-серверов через guild.chunk().
 
         Args:
             target_members: Список участников main-сервера для поиска
+                (None = кешировать всех, когда целевой список заранее неизвестен)
 
         Returns:
-            Кеш {(guild_id, user_id): Member}
+            Кеш {user_id: [(Guild, role_ids), ...]} - обратный индекс по
+            пользователю с уже отфильтрованными ID ролей (кортежи - без
+            повторного is_default() на каждый синк)
         """
-        main_server_id = self.config.get_main_server_id()
+        main_server_id = self._main_server_id
         source_guilds = [g for g in self.bot.guilds if g.id != main_server_id]
-        cache: Dict[tuple, discord.Member] = {}
-
-        target_user_ids = {m.id for m in target_members}
+        cache: Dict[int, List[Tuple[discord.Guild, Tuple[int, ...]]]] = {}
+
+        target_user_ids = {m.id for m in target_members} if target_members is not None else None
+
+        # Фаза 1: параллельный chunk() - round-trip'ы к gateway независимы,
+        # K последовательных ожиданий схлопываются в одно
+        to_chunk = [g for g in source_guilds if not g.chunked]
+        failed_chunks = set()
+        if to_chunk:
+            chunk_results = await asyncio.gather(
+                *(g.chunk() for g in to_chunk),
+                return_exceptions=True
+            )
+            for chunk_guild, chunk_result in zip(to_chunk, chunk_results):
+                if isinstance(chunk_result, Exception):
+                    logger.warning(
+                        f"Не удалось загрузить участников сервера {chunk_guild.name} "
+                        f"через chunk: {chunk_result}. Пропускаем."
+                    )
+                    failed_chunks.add(chunk_guild.id)
+                else:
+                    logger.debug("Загружены участники через chunk для сервера %s", chunk_guild.name)
 
+        # Фаза 2: заполнение кеша из памяти (без I/O)
         for guild in source_guilds:
+            if guild.id in failed_chunks:
+                continue
             try:
-                if not guild.chunked:
-                    try:
-                        await guild.chunk()
-                        logger.debug(f"Загружены участники через chunk для сервера {guild.name}")
-                    except Exception as e:
-                        logger.warning(
-                            f"Не удалось загрузить участников сервера {guild.name} "
-                            f"через chunk: {e}. Пропускаем."
-                        )
-                        continue
-
                 for gm in guild.members:
-                    if gm.id in target_user_ids and not gm.bot:
-                        cache[(guild.id, gm.id)] = gm
+                    if gm.bot or (target_user_ids is not None and gm.id not in target_user_ids):
+                        continue
+                    role_ids = tuple(r.id for r in gm.roles if not r.is_default())
+                    # Участники без ролей не влияют на расчет - не кешируем
+                    if role_ids:
+                        cache.setdefault(gm.id, []).append((guild, role_ids))
 
             except Exception as e:
                 logger.warning(f"Ошибка предзагрузки участников с сервера {guild.name}: {e}")
 
         logger.info(
-            f"Предзагружено {len(cache)} записей участников "
+            f"Предзагружено {len(cache)} пользователей "
             f"с {len(source_guilds)} серверов"
         )
         return cache
@@ -721,7 +1013,7 @@ class SyncEngine:
             Словарь со статистикой синхронизации
         """
         if guild_id is None:
-            guild_id = self.config.get_main_server_id()
+            guild_id = self._main_server_id
 
         guild = self.bot.get_guild(guild_id)
         if not guild:
@@ -730,34 +1022,46 @@ class SyncEngine:
 
         logger.info(f"Начало массовой синхронизации на сервере {guild.name}")
 
-        non_bot_members = [m for m in guild.members if not m.bot]
-
         stats = {
-            "total": len(non_bot_members),
+            "total": 0,
             "processed": 0,
             "success": 0,
             "failed": 0,
-            "skipped": len([m for m in guild.members if m.bot]),
+            "skipped": 0,
             "no_changes": 0
         }
 
-        # Предзагрузка участников со всех source-серверов
-        source_members_cache = await self._prefetch_source_members(non_bot_members)
+        # Предзагрузка участников со всех source-серверов; целевой список
+        # заранее неизвестен (участники main-сервера приходят потоком)
+        source_members_cache = await self._prefetch_source_members()
 
-        # Пакетные DB-операции
+        # Пакетные DB-операции; flush-задачи уходят в фон и догоняются
+        # в конце - запись в БД перекрывается со следующими синками
         batch_db_ops: list = []
+        flush_tasks: list = []
         db_errors = 0
 
-        for i, mb in enumerate(non_bot_members):
-            try:
-                result = await self.sync_user_roles(
-                    mb.id,
-                    trigger_type="manual",
-                    member=mb,
-                    source_members_cache=source_members_cache,
-                    batch_db_ops=batch_db_ops
-                )
+        # Ограниченный параллелизм: K пользователей синхронизируются
+        # одновременно, per-route rate limits дожимает сам discord.py
+        semaphore = asyncio.Semaphore(10)
+
+        async def _sync_one(mb: discord.Member) -> None:
+            async with semaphore:
+                try:
+                    result = await self.sync_user_roles(
+                        mb.id,
+                        trigger_type="manual",
+                        member=mb,
+                        source_members_cache=source_members_cache,
+                        batch_db_ops=batch_db_ops
+                    )
+                except Exception as e:
+                    logger.error(f"Ошибка синхронизации пользователя {mb.id}: {e}")
+                    result = None
 
+            if result is None:
+                stats["failed"] += 1
+            else:
                 if result.success:
                     stats["success"] += 1
                 else:
@@ -766,21 +1070,16 @@ class SyncEngine:
                 if result.total_changes == 0:
                     stats["no_changes"] += 1
 
-                # Smart delay: только если были реальные изменения ролей
-                if result.total_changes > 0:
-                    await asyncio.sleep(0.3)
-
-            except Exception as e:
-                logger.error(f"Ошибка синхронизации пользователя {mb.id}: {e}")
-                stats["failed"] += 1
+            stats["processed"] += 1
 
-            stats["processed"] = i + 1
-
-            # Периодический flush DB (каждые ~200 операций)
+            # Периодический flush DB (каждые ~200 операций); срез + удаление
+            # без await между ними - конкурентные задачи ничего не теряют.
+            # Сам flush не ждем: aiosqlite сериализует команды внутри себя,
+            # а время записи прячется за Discord-запросами следующих задач
             if len(batch_db_ops) > 200:
-                if not await self._flush_batch_db_ops(batch_db_ops):
-                    db_errors += 1
-                batch_db_ops.clear()
+                to_flush = batch_db_ops[:]
+                del batch_db_ops[:len(to_flush)]
+                flush_tasks.append(asyncio.ensure_future(self._flush_batch_db_ops(to_flush)))
 
             # Progress callback каждые 10 пользователей или в конце
             if progress_callback and (stats["processed"] % 10 == 0 or stats["processed"] == stats["total"]):
@@ -789,7 +1088,41 @@ class SyncEngine:
                 except Exception:
                     pass
 
-        # Финальный flush оставшихся DB-операций
+        # Целевые роли всех активных маппингов - для быстрой проверки
+        # "нечего снимать" у пользователей вне source-серверов
+        target_role_ids = self.role_mapper.target_role_ids
+
+        # Потоковая выборка участников: задачи ставятся по мере поступления,
+        # без материализации полного списка guild.members в памяти
+        tasks: list = []
+        try:
+            async for mb in guild.fetch_members(limit=None):
+                if mb.bot:
+                    stats["skipped"] += 1
+                    continue
+                stats["total"] += 1
+
+                # Пользователь отсутствует на source-серверах и не имеет ни
+                # одной замапленной роли - синхронизировать нечего, весь
+                # путь (расчет, диф, DB-записи) пропускается целиком
+                if mb.id not in source_members_cache and not (
+                    self._current_role_ids(mb) & target_role_ids
+                ):
+                    stats["processed"] += 1
+                    stats["no_changes"] += 1
+                    stats["success"] += 1
+                    continue
+
+                tasks.append(asyncio.ensure_future(_sync_one(mb)))
+        except discord.HTTPException as e:
+            logger.error(f"Ошибка потоковой выборки участников сервера {guild.name}: {e}")
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        # Дожидаемся фоновых flush-задач и сбрасываем остаток
+        if flush_tasks:
+            db_errors += sum(1 for ok in await asyncio.gather(*flush_tasks) if not ok)
         if not await self._flush_batch_db_ops(batch_db_ops):
             db_errors += 1
 
@@ -805,6 +1138,48 @@ class SyncEngine:
 
         return stats
 
+    async def shutdown(self) -> None:
+        """
+        Остановить фоновые воркеры и дописать накопленное в БД
+
+        Вызывается при выгрузке Cog: остаток очереди событий и буферы
+        статистики сбрасываются, чтобы ничего не потерялось при остановке.
+        """
+        # Снимаем слушателей - иначе бот держит ссылки на выгруженный
+        # движок и тот продолжает обрабатывать события ролей
+        if hasattr(self.bot, "remove_listener"):
+            self.bot.remove_listener(self._on_guild_role_create, "on_guild_role_create")
+            self.bot.remove_listener(self._on_guild_role_update, "on_guild_role_update")
+            self.bot.remove_listener(self._on_guild_role_delete, "on_guild_role_delete")
+
+        for attr in ("_log_flusher_task", "_stats_flusher_task"):
+            task = getattr(self, attr)
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                except Exception:
+                    pass
+                setattr(self, attr, None)
+
+        # Остаток очереди событий - одной транзакцией
+        if self._log_queue is not None:
+            batch = []
+            while not self._log_queue.empty():
+                batch.append(("log_sync_event", self._log_queue.get_nowait()))
+            if batch:
+                try:
+                    await self.db.execute_batch(batch)
+                except Exception as e:
+                    logger.error(f"Ошибка финальной записи событий синхронизации: {e}", exc_info=True)
+
+        try:
+            await self._flush_pending_stats()
+        except Exception as e:
+            logger.error(f"Ошибка финального сброса статистики: {e}", exc_info=True)
+
     async def _log_sync_event(
         self,
         user_id: int,
@@ -813,14 +1188,100 @@ class SyncEngine:
         success: bool,
         error_message: Optional[str] = None
     ):
-        """Вспомогательный метод для логирования событий синхронизации"""
+        """
+        Логировать событие синхронизации через фоновую очередь
+
+        Событие ставится в очередь без ожидания записи - путь синхронизации
+        не блокируется на round-trip в БД; фоновый воркер пишет пакетами.
+        """
         try:
-            await self.db.log_sync_event(
-                user_id=user_id,
-                action_type=action_type,
-                trigger_type=trigger_type,
-                success=success,
-                error_message=error_message
-            )
+            if self._log_queue is None:
+                self._log_queue = asyncio.Queue()
+                self._log_flusher_task = asyncio.ensure_future(self._log_flusher())
+
+            self._log_queue.put_nowait((
+                user_id, action_type, trigger_type, success,
+                None, None, error_message
+            ))
         except Exception as e:
             logger.error(f"Ошибка логирования события: {e}", exc_info=True)
+
+    def _buffer_statistics(self, trigger_type: str, success: bool, roles_assigned: int) -> None:
+        """
+        Накопить инкременты статистики в памяти вместо немедленного UPDATE
+
+        Args:
+            trigger_type: Тип триггера
+            success: Успешна ли синхронизация
+            roles_assigned: Количество назначенных ролей
+        """
+        buf = self._stats_buf
+        buf["total"] += 1
+        if trigger_type in buf:
+            buf[trigger_type] += 1
+        buf["success" if success else "failed"] += 1
+        buf["roles"] += roles_assigned
+
+        if self._stats_flusher_task is None:
+            self._stats_flusher_task = asyncio.ensure_future(self._stats_flusher())
+
+    async def _stats_flusher(self):
+        """Фоновый воркер: раз в 5 секунд сбрасывает буферы статистики в БД"""
+        while True:
+            await asyncio.sleep(5)
+            try:
+                await self._flush_pending_stats()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка фонового сброса статистики: {e}", exc_info=True)
+
+    async def _flush_pending_stats(self) -> None:
+        """Записать накопленную статистику и sync_state одним пакетом"""
+        buf = self._stats_buf
+        pending_states = self._pending_sync_states
+
+        if buf["total"] == 0 and not pending_states:
+            return
+
+        # Забираем буферы и сразу подменяем свежими - инкременты,
+        # пришедшие во время записи, попадут в следующий сброс
+        self._stats_buf = {
+            "total": 0, "button": 0, "auto": 0, "manual": 0,
+            "success": 0, "failed": 0, "roles": 0
+        }
+        self._pending_sync_states = set()
+
+        if buf["total"] > 0:
+            await self.db.update_statistics_aggregated(
+                total_syncs=buf["total"],
+                button_syncs=buf["button"],
+                auto_syncs=buf["auto"],
+                manual_syncs=buf["manual"],
+                successful_syncs=buf["success"],
+                failed_syncs=buf["failed"],
+                roles_assigned=buf["roles"]
+            )
+        if pending_states:
+            await self.db.update_sync_states_bulk(list(pending_states))
+
+    async def _log_flusher(self):
+        """
+        Фоновый воркер очереди логов: копит до 500 событий или 100мс
+        и записывает их одной транзакцией через execute_batch
+        """
+        while True:
+            try:
+                batch = [("log_sync_event", await self._log_queue.get())]
+                try:
+                    while len(batch) < 500:
+                        params = await asyncio.wait_for(self._log_queue.get(), timeout=0.1)
+                        batch.append(("log_sync_event", params))
+                except asyncio.TimeoutError:
+                    pass
+
+                await self.db.execute_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка фоновой записи событий синхронизации: {e}", exc_info=True)
@@ -120,6 +120,21 @@ ON role_mapping_cache(source_server_id, source_role_id);
 """
 
 
+async def _apply_connection_pragmas(db: aiosqlite.Connection) -> None:
+    """
+    Применить PRAGMA-оптимизации к подключению
+
+    WAL вместо журнала DELETE убирает полный fsync на каждый commit и
+    не блокирует читателей во время записи; synchronous=NORMAL под WAL
+    безопасен при сбое приложения.
+    """
+    await db.execute("PRAGMA journal_mode=WAL")
+    await db.execute("PRAGMA synchronous=NORMAL")
+    await db.execute("PRAGMA temp_store=MEMORY")
+    await db.execute("PRAGMA cache_size=10000")
+    await db.execute("PRAGMA busy_timeout=5000")
+
+
 async def initialize_database(db_path: str) -> None:
     """
     Инициализация базы данных - создание всех таблиц и индексов
@@ -134,6 +149,10 @@ async def initialize_database(db_path: str) -> None:
 
     try:
         async with aiosqlite.connect(db_path) as db:
+            # WAL липнет к файлу БД - все последующие подключения наследуют
+            # режим; остальные PRAGMA задают разумный базис для записи
+            await _apply_connection_pragmas(db)
+
             # Создаем таблицы
             await db.execute(CREATE_SYNC_STATE_TABLE)
             logger.debug("Таблица sync_state создана")
@@ -182,4 +201,5 @@ async def get_database_connection(db_path: str) -> aiosqlite.Connection:
     """
     conn = await aiosqlite.connect(db_path)
     conn.row_factory = aiosqlite.Row
+    await _apply_connection_pragmas(conn)
     return conn
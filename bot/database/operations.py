@@ -3,6 +3,7 @@ CRUD операции для работы с базой данных
 """
 
 import json
+import asyncio
 import aiosqlite
 from datetime import datetime, date
 from typing import List, Dict, Optional, Tuple
@@ -24,24 +25,46 @@ class DatabaseOperations:
         """
         self.db_path = db_path
         self._connection: Optional[aiosqlite.Connection] = None
+        # Пул подключений-читателей: под WAL чтения не блокируются
+        # писателем, но одно подключение сериализует все запросы подряд
+        self._reader_pool: Optional[asyncio.Queue] = None
+        # Транзакции писателя сериализуются: commit/rollback действуют на
+        # все незакоммиченное в подключении, поэтому конкурентные батчи
+        # на одном writer-соединении коммитили бы чужую недописанную работу
+        self._write_lock = asyncio.Lock()
+
+    # Количество подключений-читателей в пуле
+    _READER_POOL_SIZE = 4
 
     async def connect(self) -> None:
-        """Установить постоянное подключение к БД"""
+        """Установить постоянное подключение к БД и пул читателей"""
         if self._connection is None:
-            self._connection = await aiosqlite.connect(self.db_path)
-            self._connection.row_factory = aiosqlite.Row
-            # Оптимизации SQLite
-            await self._connection.execute("PRAGMA journal_mode=WAL")
-            await self._connection.execute("PRAGMA synchronous=NORMAL")
-            await self._connection.execute("PRAGMA cache_size=10000")
+            self._connection = await self._open_connection()
+            self._reader_pool = asyncio.Queue()
+            for _ in range(self._READER_POOL_SIZE):
+                self._reader_pool.put_nowait(await self._open_connection())
             logger.info("Подключение к БД установлено")
 
+    async def _open_connection(self) -> aiosqlite.Connection:
+        """Открыть подключение с оптимизациями SQLite"""
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute("PRAGMA cache_size=10000")
+        await conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
     async def close(self) -> None:
-        """Закрыть подключение к БД"""
+        """Закрыть подключение к БД и пул читателей"""
         if self._connection:
             await self._connection.close()
             self._connection = None
-            logger.info("Подключение к БД закрыто")
+        if self._reader_pool is not None:
+            while not self._reader_pool.empty():
+                await self._reader_pool.get_nowait().close()
+            self._reader_pool = None
+        logger.info("Подключение к БД закрыто")
 
     async def _get_connection(self) -> aiosqlite.Connection:
         """Получить подключение (создать если не существует)"""
@@ -53,24 +76,40 @@ class DatabaseOperations:
         """Выполнить SQL запрос"""
         try:
             db = await self._get_connection()
-            cursor = await db.execute(query, params)
-            await db.commit()
+            async with self._write_lock:
+                try:
+                    cursor = await db.execute(query, params)
+                    await db.commit()
+                except Exception:
+                    try:
+                        await db.rollback()
+                    except Exception:
+                        pass
+                    raise
             return cursor
         except Exception as e:
             logger.error(f"Ошибка выполнения запроса: {e}", exc_info=True)
             raise DatabaseError(f"Database error: {e}")
 
     async def _fetchone(self, query: str, params: tuple = ()) -> Optional[aiosqlite.Row]:
-        """Выполнить запрос и вернуть одну строку"""
-        db = await self._get_connection()
-        async with db.execute(query, params) as cursor:
-            return await cursor.fetchone()
+        """Выполнить запрос и вернуть одну строку (через пул читателей)"""
+        await self._get_connection()
+        reader = await self._reader_pool.get()
+        try:
+            async with reader.execute(query, params) as cursor:
+                return await cursor.fetchone()
+        finally:
+            self._reader_pool.put_nowait(reader)
 
     async def _fetchall(self, query: str, params: tuple = ()) -> List[aiosqlite.Row]:
-        """Выполнить запрос и вернуть все строки"""
-        db = await self._get_connection()
-        async with db.execute(query, params) as cursor:
-            return await cursor.fetchall()
+        """Выполнить запрос и вернуть все строки (через пул читателей)"""
+        await self._get_connection()
+        reader = await self._reader_pool.get()
+        try:
+            async with reader.execute(query, params) as cursor:
+                return await cursor.fetchall()
+        finally:
+            self._reader_pool.put_nowait(reader)
 
     # ============ Batch Operations ============
 
@@ -88,90 +127,110 @@ class DatabaseOperations:
 
         db = await self._get_connection()
 
+        # Append-only вставки (журналы) собираются и уходят одним
+        # executemany на таблицу - порядок строк внутри журнала не несет
+        # семантики, а один вызов драйвера сильно дешевле N execute
+        log_rows: List[tuple] = []
+        assignment_rows: List[tuple] = []
+
         try:
-            for op_type, params in operations:
-                if op_type == "log_sync_event":
-                    user_id, action_type, trigger_type, success, *rest = params
-                    target_server_id = rest[0] if len(rest) > 0 else None
-                    target_role_id = rest[1] if len(rest) > 1 else None
-                    error_message = rest[2] if len(rest) > 2 else None
-                    await db.execute(
-                        """INSERT INTO sync_logs (
-                            user_id, action_type, trigger_type, success,
-                            source_server_id, source_role_id,
-                            target_server_id, target_role_id, error_message
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                        (user_id, action_type, trigger_type, success,
-                         None, None, target_server_id, target_role_id, error_message)
-                    )
-
-                elif op_type == "record_role_assignment":
-                    await db.execute(
-                        """INSERT INTO role_assignments (
-                            user_id, source_server_id, source_role_id,
-                            target_server_id, target_role_id, assignment_type
-                        ) VALUES (?, ?, ?, ?, ?, ?)""",
-                        params
-                    )
-
-                elif op_type == "update_sync_state":
-                    user_id, main_server_id = params
-                    await db.execute(
-                        """INSERT INTO sync_state (user_id, main_server_id, last_sync_timestamp, sync_count)
-                        VALUES (?, ?, CURRENT_TIMESTAMP, 1)
-                        ON CONFLICT(user_id, main_server_id) DO UPDATE SET
-                            last_sync_timestamp = CURRENT_TIMESTAMP,
-                            sync_count = sync_count + 1""",
-                        (user_id, main_server_id)
-                    )
-
-                elif op_type == "update_statistics":
-                    trigger_type, success, roles_assigned, user_id = params
-                    today = date.today().isoformat()
-                    button_inc = 1 if trigger_type == "button" else 0
-                    auto_inc = 1 if trigger_type == "auto" else 0
-                    manual_inc = 1 if trigger_type == "manual" else 0
-                    success_inc = 1 if success else 0
-                    failed_inc = 0 if success else 1
-                    await db.execute(
-                        """INSERT INTO statistics (
-                            stat_date, total_syncs, button_syncs, auto_syncs, manual_syncs,
-                            successful_syncs, failed_syncs, unique_users_synced, total_roles_assigned
-                        ) VALUES (?, 1, ?, ?, ?, ?, ?, 0, ?)
-                        ON CONFLICT(stat_date) DO UPDATE SET
-                            total_syncs = total_syncs + 1,
-                            button_syncs = button_syncs + ?,
-                            auto_syncs = auto_syncs + ?,
-                            manual_syncs = manual_syncs + ?,
-                            successful_syncs = successful_syncs + ?,
-                            failed_syncs = failed_syncs + ?,
-                            total_roles_assigned = total_roles_assigned + ?""",
-                        (today, button_inc, auto_inc, manual_inc, success_inc, failed_inc, roles_assigned,
-                         button_inc, auto_inc, manual_inc, success_inc, failed_inc, roles_assigned)
-                    )
-
-                elif op_type == "record_sync_session":
-                    user_id, trigger_type, success, roles_added, roles_removed, roles_failed, source_servers, errors = params
-                    await db.execute(
-                        """INSERT INTO sync_sessions (
-                            user_id, trigger_type, success,
-                            roles_added, roles_removed, roles_failed,
-                            source_servers, errors
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                        (user_id, trigger_type, success,
-                         json.dumps(roles_added), json.dumps(roles_removed),
-                         json.dumps(roles_failed), json.dumps(source_servers), json.dumps(errors))
-                    )
-
-            await db.commit()
-            logger.info(f"Пакетная операция: выполнено {len(operations)} запросов")
+            async with self._write_lock:
+                try:
+                    for op_type, params in operations:
+                        if op_type == "log_sync_event":
+                            user_id, action_type, trigger_type, success, *rest = params
+                            target_server_id = rest[0] if len(rest) > 0 else None
+                            target_role_id = rest[1] if len(rest) > 1 else None
+                            error_message = rest[2] if len(rest) > 2 else None
+                            log_rows.append(
+                                (user_id, action_type, trigger_type, success,
+                                 None, None, target_server_id, target_role_id, error_message)
+                            )
+
+                        elif op_type == "record_role_assignment":
+                            assignment_rows.append(tuple(params))
+
+                        elif op_type == "update_sync_state":
+                            user_id, main_server_id = params
+                            await db.execute(
+                                """INSERT INTO sync_state (user_id, main_server_id, last_sync_timestamp, sync_count)
+                                VALUES (?, ?, CURRENT_TIMESTAMP, 1)
+                                ON CONFLICT(user_id, main_server_id) DO UPDATE SET
+                                    last_sync_timestamp = CURRENT_TIMESTAMP,
+                                    sync_count = sync_count + 1""",
+                                (user_id, main_server_id)
+                            )
+
+                        elif op_type == "update_statistics":
+                            trigger_type, success, roles_assigned, user_id = params
+                            today = date.today().isoformat()
+                            button_inc = 1 if trigger_type == "button" else 0
+                            auto_inc = 1 if trigger_type == "auto" else 0
+                            manual_inc = 1 if trigger_type == "manual" else 0
+                            success_inc = 1 if success else 0
+                            failed_inc = 0 if success else 1
+                            await db.execute(
+                                """INSERT INTO statistics (
+                                    stat_date, total_syncs, button_syncs, auto_syncs, manual_syncs,
+                                    successful_syncs, failed_syncs, unique_users_synced, total_roles_assigned
+                                ) VALUES (?, 1, ?, ?, ?, ?, ?, 0, ?)
+                                ON CONFLICT(stat_date) DO UPDATE SET
+                                    total_syncs = total_syncs + 1,
+                                    button_syncs = button_syncs + ?,
+                                    auto_syncs = auto_syncs + ?,
+                                    manual_syncs = manual_syncs + ?,
+                                    successful_syncs = successful_syncs + ?,
+                                    failed_syncs = failed_syncs + ?,
+                                    total_roles_assigned = total_roles_assigned + ?""",
+                                (today, button_inc, auto_inc, manual_inc, success_inc, failed_inc, roles_assigned,
+                                 button_inc, auto_inc, manual_inc, success_inc, failed_inc, roles_assigned)
+                            )
+
+                        elif op_type == "record_sync_session":
+                            user_id, trigger_type, success, roles_added, roles_removed, roles_failed, source_servers, errors = params
+                            await db.execute(
+                                """INSERT INTO sync_sessions (
+                                    user_id, trigger_type, success,
+                                    roles_added, roles_removed, roles_failed,
+                                    source_servers, errors
+                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                                (user_id, trigger_type, success,
+                                 json.dumps(roles_added), json.dumps(roles_removed),
+                                 json.dumps(roles_failed), json.dumps(source_servers), json.dumps(errors))
+                            )
+
+                    if log_rows:
+                        await db.executemany(
+                            """INSERT INTO sync_logs (
+                                user_id, action_type, trigger_type, success,
+                                source_server_id, source_role_id,
+                                target_server_id, target_role_id, error_message
+                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                            log_rows
+                        )
+
+                    if assignment_rows:
+                        await db.executemany(
+                            """INSERT INTO role_assignments (
+                                user_id, source_server_id, source_role_id,
+                                target_server_id, target_role_id, assignment_type
+                            ) VALUES (?, ?, ?, ?, ?, ?)""",
+                            assignment_rows
+                        )
+
+                    await db.commit()
+                except Exception:
+                    # Откат строго под замком: после его освобождения rollback
+                    # снес бы недописанную транзакцию соседней задачи
+                    try:
+                        await db.rollback()
+                    except Exception:
+                        pass
+                    raise
+                logger.info(f"Пакетная операция: выполнено {len(operations)} запросов")
 
         except Exception as e:
             logger.error(f"Ошибка пакетной операции БД: {e}", exc_info=True)
-            try:
-                await db.rollback()
-            except Exception:
-                pass
             raise DatabaseError(f"Batch database error: {e}")
 
     # ============ Sync State Operations ============
@@ -389,6 +448,82 @@ class DatabaseOperations:
             button_inc, auto_inc, manual_inc, success_inc, failed_inc, roles_assigned
         ))
 
+    async def update_statistics_aggregated(
+        self,
+        total_syncs: int,
+        button_syncs: int,
+        auto_syncs: int,
+        manual_syncs: int,
+        successful_syncs: int,
+        failed_syncs: int,
+        roles_assigned: int
+    ) -> None:
+        """
+        Применить накопленные счетчики статистики одним запросом
+
+        Args:
+            total_syncs: Всего синхронизаций
+            button_syncs: Синхронизаций по кнопке
+            auto_syncs: Автоматических синхронизаций
+            manual_syncs: Ручных синхронизаций
+            successful_syncs: Успешных
+            failed_syncs: Неуспешных
+            roles_assigned: Всего назначено ролей
+        """
+        today = date.today().isoformat()
+
+        query = """
+        INSERT INTO statistics (
+            stat_date, total_syncs, button_syncs, auto_syncs, manual_syncs,
+            successful_syncs, failed_syncs, unique_users_synced, total_roles_assigned
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+        ON CONFLICT(stat_date) DO UPDATE SET
+            total_syncs = total_syncs + excluded.total_syncs,
+            button_syncs = button_syncs + excluded.button_syncs,
+            auto_syncs = auto_syncs + excluded.auto_syncs,
+            manual_syncs = manual_syncs + excluded.manual_syncs,
+            successful_syncs = successful_syncs + excluded.successful_syncs,
+            failed_syncs = failed_syncs + excluded.failed_syncs,
+            total_roles_assigned = total_roles_assigned + excluded.total_roles_assigned
+        """
+        await self._execute(query, (
+            today, total_syncs, button_syncs, auto_syncs, manual_syncs,
+            successful_syncs, failed_syncs, roles_assigned
+        ))
+
+    async def update_sync_states_bulk(self, rows: List[Tuple[int, int]]) -> None:
+        """
+        Обновить состояния синхронизации пакетно (один executemany + один commit)
+
+        Args:
+            rows: Список пар (user_id, main_server_id)
+        """
+        if not rows:
+            return
+
+        query = """
+        INSERT INTO sync_state (user_id, main_server_id, last_sync_timestamp, sync_count)
+        VALUES (?, ?, CURRENT_TIMESTAMP, 1)
+        ON CONFLICT(user_id, main_server_id) DO UPDATE SET
+            last_sync_timestamp = CURRENT_TIMESTAMP,
+            sync_count = sync_count + 1
+        """
+        try:
+            db = await self._get_connection()
+            async with self._write_lock:
+                try:
+                    await db.executemany(query, rows)
+                    await db.commit()
+                except Exception:
+                    try:
+                        await db.rollback()
+                    except Exception:
+                        pass
+                    raise
+        except Exception as e:
+            logger.error(f"Ошибка пакетного обновления sync_state: {e}", exc_info=True)
+            raise DatabaseError(f"Database error: {e}")
+
     async def get_statistics_summary(self, days: int = 30) -> Dict:
         """
         Получить сводную статистику за период
@@ -560,6 +695,48 @@ class DatabaseOperations:
             target_role_id, enabled, description
         ))
 
+    async def cache_role_mappings_bulk(self, rows: List[Tuple]) -> None:
+        """
+        Кешировать маппинги ролей пакетно (один executemany + один commit)
+
+        Args:
+            rows: Список кортежей (mapping_id, source_server_id, source_role_id,
+                  target_server_id, target_role_id, enabled, description)
+        """
+        if not rows:
+            return
+
+        query = """
+        INSERT INTO role_mapping_cache (
+            mapping_id, source_server_id, source_role_id,
+            target_server_id, target_role_id, enabled, description
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(mapping_id) DO UPDATE SET
+            source_server_id = excluded.source_server_id,
+            source_role_id = excluded.source_role_id,
+            target_server_id = excluded.target_server_id,
+            target_role_id = excluded.target_role_id,
+            enabled = excluded.enabled,
+            description = excluded.description,
+            last_updated = CURRENT_TIMESTAMP
+        """
+        try:
+            db = await self._get_connection()
+            async with self._write_lock:
+                try:
+                    await db.executemany(query, rows)
+                    await db.commit()
+                except Exception:
+                    try:
+                        await db.rollback()
+                    except Exception:
+                        pass
+                    raise
+            logger.info(f"Пакетно закешировано {len(rows)} маппингов")
+        except Exception as e:
+            logger.error(f"Ошибка пакетного кеширования маппингов: {e}", exc_info=True)
+            raise DatabaseError(f"Database error: {e}")
+
     async def get_target_role(
         self,
         source_server_id: int,
@@ -593,6 +770,64 @@ class DatabaseOperations:
         rows = await self._fetchall(query)
         return [dict(row) for row in rows]
 
+    async def update_mapping_description(self, mapping_id: str, description: str) -> None:
+        """
+        Обновить только описание маппинга (узкий UPDATE вместо полного upsert)
+
+        Args:
+            mapping_id: ID маппинга
+            description: Новое описание
+        """
+        query = """
+        UPDATE role_mapping_cache
+        SET description = ?, last_updated = CURRENT_TIMESTAMP
+        WHERE mapping_id = ?
+        """
+        await self._execute(query, (description, mapping_id))
+
+    async def update_mapping_enabled(self, mapping_id: str, enabled: bool) -> None:
+        """
+        Обновить только флаг enabled маппинга (узкий UPDATE вместо полного upsert)
+
+        Args:
+            mapping_id: ID маппинга
+            enabled: Новое состояние
+        """
+        query = """
+        UPDATE role_mapping_cache
+        SET enabled = ?, last_updated = CURRENT_TIMESTAMP
+        WHERE mapping_id = ?
+        """
+        await self._execute(query, (enabled, mapping_id))
+
+    async def remove_mappings_bulk(self, mapping_ids: List[str]) -> None:
+        """
+        Удалить маппинги пакетно (один executemany + один commit)
+
+        Args:
+            mapping_ids: Список ID маппингов для удаления
+        """
+        if not mapping_ids:
+            return
+
+        query = "DELETE FROM role_mapping_cache WHERE mapping_id = ?"
+        try:
+            db = await self._get_connection()
+            async with self._write_lock:
+                try:
+                    await db.executemany(query, [(mapping_id,) for mapping_id in mapping_ids])
+                    await db.commit()
+                except Exception:
+                    try:
+                        await db.rollback()
+                    except Exception:
+                        pass
+                    raise
+            logger.info(f"Пакетно удалено {len(mapping_ids)} маппингов")
+        except Exception as e:
+            logger.error(f"Ошибка пакетного удаления маппингов: {e}", exc_info=True)
+            raise DatabaseError(f"Database error: {e}")
+
     async def remove_mapping(self, mapping_id: str) -> bool:
         """
         Удалить маппинг роли
@@ -61,6 +61,9 @@ class RoleSyncBot(commands.Bot):
             db_path = self.config.get_database_path()
             await initialize_database(db_path)
             self.db = DatabaseOperations(db_path)
+            # Открываем постоянное подключение сразу, а не лениво при
+            # первом запросе - ошибки доступа к БД всплывают на старте
+            await self.db.connect()
             logger.info("База данных инициализирована")
 
             # Кешируем маппинги ролей в БД
@@ -88,17 +91,20 @@ class RoleSyncBot(commands.Bot):
             # Загружаем маппинги из конфигурации
             mappings = self.config.get_role_mappings()
 
-            # Кешируем каждый маппинг
-            for mapping in mappings:
-                await self.db.cache_role_mapping(
-                    mapping_id=mapping.id,
-                    source_server_id=mapping.source_server_id,
-                    source_role_id=mapping.source_role_id,
-                    target_server_id=mapping.target_server_id,
-                    target_role_id=mapping.target_role_id,
-                    enabled=mapping.enabled,
-                    description=mapping.description
+            # Кешируем все маппинги одним executemany вместо
+            # commit'а на каждую строку
+            await self.db.cache_role_mappings_bulk([
+                (
+                    mapping.id,
+                    mapping.source_server_id,
+                    mapping.source_role_id,
+                    mapping.target_server_id,
+                    mapping.target_role_id,
+                    mapping.enabled,
+                    mapping.description
                 )
+                for mapping in mappings
+            ])
 
             logger.info(f"Закешировано {len(mappings)} маппингов ролей")
 
@@ -183,6 +189,10 @@ class RoleSyncBot(commands.Bot):
         """Корректное закрытие бота"""
         logger.info("Закрытие бота...")
 
+        # Сначала Discord: super().close() выгружает cogs, а их cog_unload
+        # дописывает очереди и буферы в БД - она должна быть еще открыта
+        await super().close()
+
         # Закрываем соединение с БД
         if self.db:
             try:
@@ -191,6 +201,4 @@ class RoleSyncBot(commands.Bot):
             except Exception as e:
                 logger.error(f"Ошибка закрытия БД: {e}", exc_info=True)
 
-        # Закрываем Discord соединение
-        await super().close()
         logger.info("Бот остановлен")
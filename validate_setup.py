@@ -39,12 +39,13 @@ def print_error(text: str):
 def check_python_version() -> bool:
     """Проверка версии Python"""
     version = sys.version_info
-    if version.major >= 3 and version.minor >= 9:
+    # 3.10+: код использует @dataclass(slots=True)
+    if version.major >= 3 and version.minor >= 10:
         print_success(f"Python версия: {version.major}.{version.minor}.{version.micro}")
         return True
     else:
         print_error(f"Python версия слишком старая: {version.major}.{version.minor}.{version.micro}")
-        print_error("Требуется Python 3.9 или выше")
+        print_error("Требуется Python 3.10 или выше")
         return False
 
 def check_dependencies() -> Tuple[bool, List[str]]: